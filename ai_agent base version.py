@@ -9,6 +9,10 @@ from exa_py import Exa
 from typing import Type, Union
 import requests
 import logging
+import uuid
+from cache import ResponseCache, make_key, normalize_query
+from http_client import limited_request
+from report_store import ReportStore
 from scripts.regsetup import description
 
 # run file:
@@ -31,6 +35,13 @@ llm = LLM(
 Future improvements: Add tools for web scraping, data parsing, or citation management
 to further enhance the agent's research capabilities.
 """
+# Answers are cached on disk keyed by endpoint + normalized query, so repeated topics skip the network.
+exa_cache = ResponseCache(
+    "exa",
+    ttl=float(os.getenv("EXA_CACHE_TTL", 24 * 60 * 60)),
+    max_entries=int(os.getenv("EXA_CACHE_MAX_ENTRIES", 5000)),
+)
+
 class EXAAnswerToolSchema(BaseModel):
     query: str = Field(description='The query you want to ask the EXA.')
 
@@ -58,17 +69,20 @@ class EXXAnswerTool(BaseTool):
         print("DEBUG: query type:", type(query))
         print("DEBUG: query content:", query)
 
+        cache_key = make_key(self.answer_url, normalize_query(query))
+        cached = exa_cache.get(cache_key)
+        if cached is not None:
+            logger.info("EXA cache hit (%s)", exa_cache.stats())
+            return cached
+
         try:
-            response = requests.post(
-                self.answer_url,
-                json={"query": query},
-                headers=self.headers,
-            )
-            response.raise_for_status()
+            # Rate limited and retried with backoff on 429 / 5xx; only a persistent failure gets here
+            response = limited_request("exa", "POST", self.answer_url, json={"query": query}, headers=self.headers)
         except requests.exceptions.HTTPError as http_error:
+            # Reported back to the agent instead of raising, so one failed search doesn't abort the kickoff
             print(f"HTTP error occurred: {http_error}")
-            print(f"Error response: {response.content}")
-            raise
+            print(f"Error response: {http_error.response.content}")
+            return f"EXA search failed for {query!r}: {http_error}"
         except Exception as error:
             print(f"An error occurred: {error}")
             raise
@@ -81,6 +95,8 @@ class EXXAnswerTool(BaseTool):
             output += "Citations:\n"
             for citation in citations:
                 output += f"- {citation['title']} ({citation['url']})\n"
+
+        exa_cache.set(cache_key, output)
         return output
 
 # ---------- Callback Function ---------------------
@@ -130,7 +146,6 @@ The format should be in Markdown (without using "```" tags) and include the foll
 """,
     agent=research_agent,
     callback=callback_function,
-    output_file="research_report.md",
 )
 
 # ---------- Crew Configuration ---------------------
@@ -143,7 +158,18 @@ research_crew = Crew(
 
 # ---------- Run the Crew ---------------------
 input_topic = {"topic": input("Enter a topic to research:\n")}
-research_crew.kickoff(inputs=input_topic)
+report_store = ReportStore()
+# A fresh report for the same topic is printed straight away instead of running the crew again
+stored = report_store.find_fresh(input_topic["topic"], "OpenAI 4o mini")
+if stored is not None:
+    print(f"Served from the report store (run {stored['run_id']}, {stored['path']}):\n")
+    print(stored["text"])
+else:
+    # Every run gets its own report file in the report store, so concurrent runs never overwrite each other
+    run_id = uuid.uuid4().hex[:12]
+    result = research_crew.kickoff(inputs=input_topic)
+    report_file = report_store.save(run_id, input_topic["topic"], "OpenAI 4o mini", result.raw)
+    print(f"Report saved to {report_file} (run {run_id})")
 
 # What are the most major health disparities affecting african american in america
 # find relevant research on phytoplankton
@@ -0,0 +1,189 @@
+import argparse
+import csv
+import json
+import os
+import re
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from dotenv import load_dotenv
+
+from cache import bypass_cache
+from checkpoints import Checkpointer, checkpointing
+from report_store import ReportStore
+from search_budget import search_budget
+from sources import tracking_sources
+from http_client import PROVIDERS, set_provider_limit
+from tracing import RunTrace, tracing
+
+# run file:
+# python batch_research.py topics.jsonl --workers 8 --output-dir reports
+#
+# topics.jsonl holds one {"topic": "..."} object per line; a .csv file needs a "topic" column.
+# Each batch prints its ID; continue an interrupted batch with --resume --batch-id <id>.
+
+load_dotenv()
+
+
+# ---------- Topic Loading ---------------------
+def load_topics(path: str) -> list:
+    topics = []
+    if path.endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as handle:
+            for row in csv.DictReader(handle):
+                if row.get("topic", "").strip():
+                    topics.append(row["topic"].strip())
+    else:
+        with open(path, encoding="utf-8") as handle:
+            for line in handle:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                topic = record.get("topic") if isinstance(record, dict) else record
+                if topic and str(topic).strip():
+                    topics.append(str(topic).strip())
+    return topics
+
+
+def report_path(output_dir: str, index: int, topic: str) -> str:
+    slug = re.sub(r"[^a-z0-9]+", "-", topic.lower()).strip("-")[:60] or "topic"
+    return os.path.join(output_dir, f"{index:04d}-{slug}.md")
+
+
+def new_batch_id() -> str:
+    return time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:6]
+
+
+# ---------- Worker ---------------------
+def run_topic(index: int, topic: str, model_choice: str, output_dir: str, use_cache: bool = True,
+              resume: bool = False, store: ReportStore = None, subtopics: int = 1, batch_id: str = "") -> dict:
+    from crew_factory import build_crew, resume_crew
+
+    output_file = report_path(output_dir, index, topic)
+    # The run ID is the batch ID plus the report name: separate batches don't share checkpoints,
+    # traces or stored reports, and rerunning a batch with --resume --batch-id picks up each topic's checkpoints.
+    run_id = os.path.splitext(os.path.basename(output_file))[0]
+    if batch_id:
+        run_id = f"{batch_id}-{run_id}"
+    checkpointer = Checkpointer(run_id)
+    trace = RunTrace(topic=topic, model=model_choice, run_id=run_id)
+    started = time.perf_counter()
+    try:
+        # Crews keep per-run state on their tasks, so every topic gets its own instance.
+        stored = store.find_fresh(topic, model_choice) if store is not None and use_cache else None
+        if stored is not None:
+            print(f"Topic {index} served from the report store (run {stored['run_id']})")
+            with open(output_file, "w", encoding="utf-8") as handle:
+                handle.write(stored["text"])
+        elif resume and checkpointer.load("writing_task") is not None:
+            print(f"Topic {index} already completed in an earlier run, skipping")
+        else:
+            if resume and checkpointer.completed():
+                crew = resume_crew(model_choice, checkpointer, output_file=output_file)
+            elif subtopics > 1:
+                from fanout import FanOutCrew
+                crew = FanOutCrew(model_choice, subtopics, output_file=output_file)
+            else:
+                crew = build_crew(model_choice, output_file=output_file)
+            checkpointer.save_meta(topic=topic, model=model_choice)
+            with tracing(trace), bypass_cache(not use_cache), checkpointing(checkpointer), tracking_sources(), \
+                    search_budget():
+                result = crew.kickoff(inputs={"topic": topic})
+            if store is not None:
+                store.save(run_id, topic, model_choice, result.raw)
+        error = None
+    except Exception as exc:
+        print(f"Topic {index} failed: {exc}")
+        error = str(exc)
+    trace.finish()
+    return {
+        "index": index,
+        "topic": topic,
+        "report": output_file,
+        "trace": trace.write(),
+        "usage": trace.summary(),
+        "seconds": time.perf_counter() - started,
+        "error": error,
+    }
+
+
+# ---------- Batch Runner ---------------------
+def run_batch(topics: list, model_choice: str, output_dir: str, workers: int, use_cache: bool = True,
+              resume: bool = False, subtopics: int = 1, batch_id: str = None) -> list:
+    os.makedirs(output_dir, exist_ok=True)
+    batch_id = batch_id or new_batch_id()
+    store = ReportStore()
+    results = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(run_topic, index, topic, model_choice, output_dir, use_cache, resume, store, subtopics,
+                        batch_id)
+            for index, topic in enumerate(topics, start=1)
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            status = "failed" if result["error"] else "done"
+            print(f"[{len(results) + 1}/{len(topics)}] {status} in {result['seconds']:.1f}s: {result['topic']}")
+            results.append(result)
+    return sorted(results, key=lambda result: result["index"])
+
+
+def print_stats(results: list, wall_seconds: float):
+    durations = [result["seconds"] for result in results if not result["error"]]
+    failed = [result for result in results if result["error"]]
+    print("\n---------- Batch Summary ---------------------")
+    print(f"Topics:      {len(results)} ({len(durations)} succeeded, {len(failed)} failed)")
+    print(f"Wall time:   {wall_seconds:.1f}s")
+    print(f"Throughput:  {len(durations) / wall_seconds * 60 if wall_seconds else 0:.2f} topics/min")
+    if durations:
+        print(f"Per topic:   mean {statistics.mean(durations):.1f}s, median {statistics.median(durations):.1f}s, "
+              f"max {max(durations):.1f}s")
+    prompt_tokens = sum(result["usage"]["prompt_tokens"] for result in results)
+    completion_tokens = sum(result["usage"]["completion_tokens"] for result in results)
+    cost = sum(result["usage"]["cost_usd"] for result in results)
+    print(f"Tokens:      {prompt_tokens} in / {completion_tokens} out, estimated ${cost:.4f}")
+    for result in failed:
+        print(f"  failed: {result['topic']} ({result['error']})")
+
+
+def main():
+    from crew_factory import MODEL_CHOICES
+
+    parser = argparse.ArgumentParser(description="Run the research crew over many topics in parallel.")
+    parser.add_argument("topics", help="JSONL or CSV file of topics")
+    parser.add_argument("--model", choices=MODEL_CHOICES, default=MODEL_CHOICES[0])
+    parser.add_argument("--workers", type=int, default=4, help="number of crews running at once")
+    parser.add_argument("--output-dir", default="reports")
+    parser.add_argument("--no-cache", action="store_true", help="skip cached LLM and search responses")
+    parser.add_argument("--fanout", type=int, default=1, help="research each topic as K concurrent sub-questions")
+    parser.add_argument("--resume", action="store_true", help="reuse checkpointed task outputs from an earlier run")
+    parser.add_argument("--batch-id", help="ID of the batch to resume (printed when a batch starts)")
+    for provider in PROVIDERS:
+        parser.add_argument(f"--max-{provider}", type=int, help=f"max {provider} requests in flight at once, across all topics")
+    args = parser.parse_args()
+    if args.resume and not args.batch_id:
+        parser.error("--resume needs the --batch-id of the batch to resume")
+
+    for provider in PROVIDERS:
+        limit = getattr(args, f"max_{provider}")
+        if limit:
+            set_provider_limit(provider, limit)
+
+    topics = load_topics(args.topics)
+    batch_id = args.batch_id or new_batch_id()
+    print(f"Running {len(topics)} topics with {args.workers} workers ({args.model}), batch {batch_id}")
+    from crew_factory import llm_provider
+    if llm_provider(args.model) == "ollama":
+        from http_client import warm_ollama
+        # Load the local model before the clock starts, so the first topic doesn't pay for it
+        warm_ollama(background=False)
+    started = time.perf_counter()
+    results = run_batch(topics, args.model, args.output_dir, args.workers, use_cache=not args.no_cache,
+                        resume=args.resume, subtopics=args.fanout, batch_id=batch_id)
+    print_stats(results, time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import argparse
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_services import FakeService
+
+# run file:
+# python benchmarks/bench_pipeline.py --topics 20 --concurrency 1 4 8 --latency 0.2
+#
+# Boots fake EXA, Serper, OpenAI and Ollama endpoints on localhost, points the crew at them and
+# drives research_crew end to end. No network access or API keys are needed.
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def point_env_at(service: FakeService, warm_cache: bool, workdir: str):
+    # Must run before crew_factory / http_client are imported: they read these at import time.
+    os.environ.update({
+        "OPENAI_API_KEY": "sk-benchmark",
+        "EXA_API_KEY": "exa-benchmark",
+        "SERPER_API_KEY": "serper-benchmark",
+        "OPENAI_BASE_URL": f"{service.url}/v1",
+        "OPENAI_API_BASE": f"{service.url}/v1",
+        "OLLAMA_BASE_URL": service.url,
+        "EXA_ANSWER_URL": f"{service.url}/answer",
+        "SERPER_BASE_URL": service.url,
+        "RESEARCH_CACHE_DIR": os.path.join(workdir, "cache"),
+        "RESEARCH_TRACE_DIR": os.path.join(workdir, "traces"),
+        "RESEARCH_CHECKPOINT_DIR": os.path.join(workdir, "checkpoints"),
+    })
+    if not warm_cache:
+        os.environ["EXA_CACHE_TTL"] = "0"
+        os.environ["LLM_CACHE"] = "0"
+
+
+def run_level(topics: list, concurrency: int, model_choice: str, output_dir: str) -> dict:
+    from batch_research import run_topic
+
+    # Each level gets its own run IDs, so it doesn't resume or overwrite the previous level's
+    # checkpoints, traces and reports
+    batch_id = f"bench-c{concurrency}"
+    os.makedirs(output_dir, exist_ok=True)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(
+            lambda item: run_topic(item[0], item[1], model_choice, output_dir, batch_id=batch_id),
+            enumerate(topics, start=1),
+        ))
+    wall = time.perf_counter() - started
+    latencies = [result["seconds"] for result in results if not result["error"]]
+    return {
+        "concurrency": concurrency,
+        "topics": len(topics),
+        "failed": sum(1 for result in results if result["error"]),
+        "wall_seconds": round(wall, 3),
+        "throughput_per_min": round(len(latencies) / wall * 60, 2) if wall else 0.0,
+        "p50_seconds": round(statistics.median(latencies), 3) if latencies else None,
+        "p95_seconds": round(percentile(latencies, 95), 3) if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of the research crew.")
+    parser.add_argument("--topics", type=int, default=10, help="topics per concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds added to every fake response")
+    parser.add_argument("--model", default="OpenAI 4o mini", choices=["OpenAI 4o mini", "Local DeepSeek r-1"])
+    parser.add_argument("--warm-cache", action="store_true", help="let the EXA and LLM caches serve repeated calls")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    topics = [f"benchmark topic {number}" for number in range(1, args.topics + 1)]
+    rows = []
+    with FakeService(latency=args.latency) as service, tempfile.TemporaryDirectory() as workdir:
+        point_env_at(service, args.warm_cache, workdir)
+        tracemalloc.start()
+        for concurrency in args.concurrency:
+            tracemalloc.reset_peak()
+            row = run_level(topics, concurrency, args.model, os.path.join(workdir, "reports", f"c{concurrency}"))
+            row["peak_python_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+            rows.append(row)
+            print(f"concurrency={row['concurrency']:<3} p50={row['p50_seconds']}s p95={row['p95_seconds']}s "
+                  f"throughput={row['throughput_per_min']}/min peak={row['peak_python_mb']}MB "
+                  f"failed={row['failed']}")
+        tracemalloc.stop()
+
+    # ru_maxrss is KiB on Linux
+    peak_rss_mb = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    print(f"peak RSS: {peak_rss_mb}MB")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump({"latency": args.latency, "model": args.model, "peak_rss_mb": peak_rss_mb,
+                       "levels": rows}, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
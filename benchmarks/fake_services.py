@@ -0,0 +1,185 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from research_models import ResearchAnalysis, ResearchArticle, ResearchFindings
+
+# ---------- Fake Backends ---------------------
+"""
+Local stand-ins for the EXA /answer endpoint, Serper, an OpenAI-compatible chat/embeddings API and
+the Ollama chat API. Every response is canned and delayed by a configurable latency, so the whole
+pipeline can be driven end to end with no network and no API credits.
+"""
+
+CANNED_ANSWER = (
+    "Recent studies report measurable disparities in access, outcomes and treatment quality, "
+    "with consistent effects across cohorts."
+)
+
+CANNED_CITATIONS = [
+    {"title": f"Benchmark Study {number}", "url": f"https://example.org/papers/{number}"}
+    for number in range(1, 6)
+]
+
+FINAL_ANSWER = """Thought: I now know the final answer
+Final Answer: # Benchmark Report
+
+## Introduction
+Canned findings produced by the local benchmark backend.
+
+## Research Overview
+- Article Titles: Benchmark Study 1, Benchmark Study 2
+- Authors: A. Author, B. Author
+- Publication Dates: 2021, 2023
+
+## Key Findings
+- Finding one.
+- Finding two.
+
+## Source URLs
+- https://example.org/papers/1
+- https://example.org/papers/2
+"""
+
+# research_task and analysis_task ask for these records, so the fake answers them with valid JSON and
+# the benchmark takes the same structured path (no converter calls) as production
+FINDINGS = ResearchFindings(articles=[
+    ResearchArticle(
+        title=citation["title"],
+        authors=["A. Author", "B. Author"],
+        published="2023",
+        url=citation["url"],
+        abstract=CANNED_ANSWER,
+        key_findings=["Finding one.", "Finding two."],
+    )
+    for citation in CANNED_CITATIONS
+])
+
+ANALYSIS = ResearchAnalysis(
+    overview="Canned analysis produced by the local benchmark backend.",
+    themes=["Theme one.", "Theme two."],
+    insights=["Insight one."],
+    gaps=["Gap one."],
+    sources=[citation["url"] for citation in CANNED_CITATIONS],
+)
+
+# A field only the record in question has, as it appears in crewai's "following format" instructions
+STRUCTURED_ANSWERS = [
+    ("articles", f"Thought: I now know the final answer\nFinal Answer: {FINDINGS.model_dump_json()}"),
+    ("inconsistencies", f"Thought: I now know the final answer\nFinal Answer: {ANALYSIS.model_dump_json()}"),
+]
+
+TOOL_ACTION = """Thought: I should search for sources first.
+Action: Batch Search Tool
+Action Input: {"queries": ["benchmark topic overview", "benchmark topic recent studies", "benchmark topic outcomes"], "source": "exa"}
+"""
+
+
+def fake_completion(messages) -> str:
+    # Search once when the search tool is on offer, then answer; mimics a well-behaved ReAct agent.
+    prompt = " ".join(str(message.get("content", "")) for message in messages)
+    already_acted = any(message.get("role") == "assistant" for message in messages)
+    if "Batch Search Tool" in prompt and not already_acted:
+        return TOOL_ACTION
+    # The expected record is described after "following format"; the context before it may hold other records
+    if "following format" in prompt:
+        output_format = prompt.rpartition("following format")[2]
+        for field, answer in STRUCTURED_ANSWERS:
+            if field in output_format:
+                return answer
+    return FINAL_ANSWER
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, payload: dict, status: int = 200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self) -> dict:
+        length = int(self.headers.get("content-length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        if self.path.startswith("/api/version"):
+            return self._send({"version": "0.0.0-benchmark"})
+        if self.path.startswith("/api/tags") or self.path.startswith("/v1/models"):
+            return self._send({"models": [], "data": []})
+        self._send({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        time.sleep(self.latency)
+        body = self._body()
+        if self.path.startswith("/answer"):
+            return self._send({"answer": CANNED_ANSWER, "citation": CANNED_CITATIONS})
+        if self.path.startswith("/search"):
+            return self._send({"organic": [
+                {"title": citation["title"], "link": citation["url"], "snippet": CANNED_ANSWER}
+                for citation in CANNED_CITATIONS
+            ]})
+        if self.path.endswith("/embeddings"):
+            inputs = body.get("input") or [""]
+            inputs = inputs if isinstance(inputs, list) else [inputs]
+            return self._send({
+                "object": "list",
+                "model": body.get("model", "fake-embedding"),
+                "data": [{"object": "embedding", "index": index, "embedding": [0.0] * 1536}
+                         for index in range(len(inputs))],
+                "usage": {"prompt_tokens": len(inputs), "total_tokens": len(inputs)},
+            })
+        if self.path.endswith("/chat/completions"):
+            content = fake_completion(body.get("messages", []))
+            return self._send({
+                "id": "chatcmpl-benchmark",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": {"prompt_tokens": 100, "completion_tokens": 100, "total_tokens": 200},
+            })
+        if self.path.startswith("/api/chat") or self.path.startswith("/api/generate"):
+            content = fake_completion(body.get("messages") or [{"content": body.get("prompt", "")}])
+            return self._send({
+                "model": body.get("model", "fake"),
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "message": {"role": "assistant", "content": content},
+                "response": content,
+                "done": True,
+                "prompt_eval_count": 100,
+                "eval_count": 100,
+            })
+        self._send({"error": "not found"}, status=404)
+
+
+class FakeService:
+    """One fake backend on an ephemeral localhost port, served from a background thread."""
+
+    def __init__(self, latency: float = 0.0):
+        handler = type("Handler", (FakeHandler,), {"latency": latency})
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
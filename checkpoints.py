@@ -0,0 +1,93 @@
+import contextvars
+import json
+import os
+import re
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+# ---------- Task Checkpoints ---------------------
+"""
+Each completed task's output is written to checkpoints/<run_id>/<task_name>.json as soon as the task
+finishes. A resumed run skips every stage that already has a checkpoint and feeds the stored output
+to later tasks as context, so a failed writing step never repeats the research.
+"""
+
+CHECKPOINT_DIR = os.getenv("RESEARCH_CHECKPOINT_DIR", "checkpoints")
+
+_current_checkpointer = contextvars.ContextVar("research_checkpointer", default=None)
+
+
+def _write_atomic(path: str, payload: dict):
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as handle:
+        json.dump(payload, handle, indent=2)
+    os.replace(tmp_path, path)
+
+
+class Checkpointer:
+    def __init__(self, run_id: str, directory: str = CHECKPOINT_DIR):
+        if not re.fullmatch(r"[\w.-]+", run_id):
+            raise ValueError(f"Invalid run ID: {run_id!r}")
+        self.run_id = run_id
+        self.path = os.path.join(directory, run_id)
+        os.makedirs(self.path, exist_ok=True)
+
+    def save_meta(self, **meta):
+        _write_atomic(os.path.join(self.path, "run.json"), {"run_id": self.run_id, "updated": time.time(), **meta})
+
+    def load_meta(self) -> dict:
+        try:
+            with open(os.path.join(self.path, "run.json"), encoding="utf-8") as handle:
+                return json.load(handle)
+        except FileNotFoundError:
+            return {}
+
+    def save(self, output):
+        _write_atomic(os.path.join(self.path, f"{output.name}.json"), {
+            "name": output.name,
+            "agent": str(output.agent),
+            "description": output.description,
+            "summary": output.summary,
+            "raw": output.raw,
+            "saved": time.time(),
+        })
+
+    def load(self, task_name: str) -> Optional[dict]:
+        try:
+            with open(os.path.join(self.path, f"{task_name}.json"), encoding="utf-8") as handle:
+                return json.load(handle)
+        except FileNotFoundError:
+            return None
+
+    def completed(self) -> list:
+        return sorted(name[:-5] for name in os.listdir(self.path) if name.endswith("_task.json"))
+
+
+# ---------- Active Checkpointer ---------------------
+def active_checkpointer() -> Optional[Checkpointer]:
+    return _current_checkpointer.get()
+
+
+@contextmanager
+def checkpointing(checkpointer: Optional[Checkpointer]):
+    token = _current_checkpointer.set(checkpointer)
+    try:
+        yield checkpointer
+    finally:
+        _current_checkpointer.reset(token)
+
+
+def save_checkpoint(output):
+    checkpointer = active_checkpointer()
+    if checkpointer is not None and output.name:
+        checkpointer.save(output)
+
+
+def list_runs(directory: str = CHECKPOINT_DIR) -> list:
+    if not os.path.isdir(directory):
+        return []
+    runs = [name for name in os.listdir(directory) if os.path.isfile(os.path.join(directory, name, "run.json"))]
+    return sorted(runs, key=lambda name: os.path.getmtime(os.path.join(directory, name, "run.json")), reverse=True)
@@ -0,0 +1,91 @@
+import re
+
+# ---------- Context Compaction ---------------------
+"""
+Shrinks a task's output before it is handed to downstream tasks as context. Repeated paragraphs,
+abstracts and citation lines are dropped first; if the text is still over the token budget, each
+Markdown section is trimmed to a share of the budget proportional to its size.
+"""
+
+CHARS_PER_TOKEN = 4
+MIN_SECTION_TOKENS = 60
+TRIM_MARKER = " [...trimmed]"
+
+_THINK_BLOCK = re.compile(r"<think>.*?</think>", re.S | re.I)
+_HEADING = re.compile(r"^#{1,6}\s|^\*\*[^*]+\*\*:?\s*$|^\d+\.\s+[A-Z][^:]{0,60}:\s*$")
+
+
+def estimate_tokens(text: str) -> int:
+    # Cheap estimate that is close enough for budgeting and needs no tokenizer
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def strip_reasoning(text: str) -> str:
+    # Reasoning models (DeepSeek-R1) prefix their answer with a <think> block; Ollama sometimes drops
+    # the opening tag, so anything before a stray closing tag is reasoning too.
+    text = _THINK_BLOCK.sub("", text)
+    if "</think>" in text:
+        text = text.rsplit("</think>", 1)[1]
+    return text.strip()
+
+
+def _fingerprint(text: str) -> str:
+    return re.sub(r"[\W_]+", " ", text.lower()).strip()
+
+
+def dedupe(text: str) -> str:
+    # Drop paragraphs and list items (citations, URLs, abstracts) that already appeared earlier.
+    seen = set()
+    kept_blocks = []
+    for block in re.split(r"\n\s*\n", text):
+        kept_lines = []
+        for line in block.split("\n"):
+            key = _fingerprint(line)
+            if len(key) > 20 and not _HEADING.match(line.strip()):
+                if key in seen:
+                    continue
+                seen.add(key)
+            kept_lines.append(line)
+        if any(line.strip() for line in kept_lines):
+            kept_blocks.append("\n".join(kept_lines))
+    return "\n\n".join(kept_blocks)
+
+
+def split_sections(text: str) -> list:
+    sections, current = [], []
+    for line in text.split("\n"):
+        if _HEADING.match(line.strip()) and current:
+            sections.append("\n".join(current))
+            current = []
+        current.append(line)
+    if current:
+        sections.append("\n".join(current))
+    return sections
+
+
+def _trim(section: str, max_chars: int) -> str:
+    if len(section) <= max_chars:
+        return section
+    cut = section[:max_chars]
+    # Prefer ending on a sentence or line boundary
+    boundary = max(cut.rfind(". "), cut.rfind("\n"))
+    if boundary > max_chars // 2:
+        cut = cut[:boundary + 1]
+    return cut.rstrip() + TRIM_MARKER
+
+
+def compact(text: str, token_budget: int) -> str:
+    text = dedupe(text)
+    if not token_budget or estimate_tokens(text) <= token_budget:
+        return text
+
+    sections = split_sections(text)
+    total = sum(len(section) for section in sections) or 1
+    budget_chars = token_budget * CHARS_PER_TOKEN
+    # Every section keeps at least a small floor, so trailing sections like Source URLs survive;
+    # the floors can push the result slightly over budget.
+    trimmed = [
+        _trim(section, max(MIN_SECTION_TOKENS * CHARS_PER_TOKEN, budget_chars * len(section) // total))
+        for section in sections
+    ]
+    return "\n".join(trimmed)
@@ -0,0 +1,481 @@
+from crewai import Agent, Task, Crew, Process
+from crewai.tasks.task_output import TaskOutput
+import json
+import os
+from pydantic import BaseModel, Field
+from crewai.tools import BaseTool
+from crewai_tools import SerperDevTool
+from typing import Callable, List, Literal, Optional, Type, Union
+import requests
+import logging
+from cache import ResponseCache, cache_bypassed, make_key, normalize_query
+from llm_backends import registry
+from http_client import limited_request, provider_slot, run_concurrently, serper_search
+from rate_limit import rate_limited
+from tracing import record_task, traced_call
+from compaction import compact, estimate_tokens, strip_reasoning
+from checkpoints import Checkpointer, save_checkpoint
+from sources import canonicalize_url, fetch_once, is_new_source
+from search_budget import budgeted_search
+from research_models import ResearchAnalysis, ResearchFindings, clean_findings, to_context
+
+# ---------- Crew Factory ---------------------
+"""
+Everything needed to build the research crew. Importing this module pulls in crewai and
+crewai_tools, so the Streamlit page leaves it to the job queue's workers, which import it when a
+run starts and build a fresh crew for every run.
+"""
+
+logger = logging.getLogger(__name__)
+
+MODEL_CHOICES = ["OpenAI 4o mini", "Local DeepSeek r-1"]
+
+# ---------- EXA Answer Tool ---------------------
+# Answers are cached on disk keyed by endpoint + normalized query, so repeated topics skip the network.
+exa_cache = ResponseCache(
+    "exa",
+    ttl=float(os.getenv("EXA_CACHE_TTL", 24 * 60 * 60)),
+    max_entries=int(os.getenv("EXA_CACHE_MAX_ENTRIES", 5000)),
+)
+
+class EXAAnswerToolSchema(BaseModel):
+    query: str = Field(description='The query you want to ask the EXA.')
+
+class EXXAnswerTool(BaseTool):
+    name: str = "EXA Answer Tool"
+    description: str = "A Tool to answer user query using EXA"
+    args_schema: Type[BaseModel] = EXAAnswerToolSchema
+    answer_url: str = os.getenv("EXA_ANSWER_URL", "https://api.exa.ai/answer")
+    headers: dict = {
+        "accept": "application/json",
+        "content-type": "application/json",
+        "x-api-key": os.getenv("EXA_API_KEY"),
+    }
+
+    def _run(self, query: Union[str, dict]) -> str:
+        return budgeted_search(self.name, self._answer, query)
+
+    def _answer(self, query: Union[str, dict]) -> str:
+        # Handle case where query is provided as a dict (with field metadata)
+        if isinstance(query, dict):
+            # Try to extract the actual query string from the dict.
+            query_value = query.get("description")
+            if not isinstance(query_value, str):
+                query_value = str(query)
+            query = query_value
+
+        logger.debug("EXA query (%s): %s", type(query).__name__, query)
+
+        # The raw response is cached, so citations can still be de-duplicated against the current run
+        cache_key = make_key(self.answer_url, normalize_query(query), "response")
+        cached = None if cache_bypassed() else exa_cache.get(cache_key)
+        if cached is not None:
+            logger.info("EXA cache hit (%s)", exa_cache.stats())
+            return self._format(json.loads(cached))
+
+        try:
+            # Rate limited and retried with backoff on 429 / 5xx; only a persistent failure gets here
+            response = limited_request("exa", "POST", self.answer_url, json={"query": query}, headers=self.headers)
+        except requests.exceptions.HTTPError as http_error:
+            # Reported back to the agent instead of raising, so one failed search doesn't abort the kickoff
+            print(f"HTTP error occurred: {http_error}")
+            print(f"Error response: {http_error.response.content}")
+            return f"EXA search failed for {query!r}: {http_error}"
+        except Exception as error:
+            print(f"An error occurred: {error}")
+            raise
+
+        response_data = response.json()
+        exa_cache.set(cache_key, json.dumps(response_data))
+        return self._format(response_data)
+
+    def _format(self, response_data: dict) -> str:
+        answer = response_data.get("answer")
+        citations = response_data.get("citation", [])
+        # Sources already cited earlier in this run are only counted, not repeated
+        new_citations = [citation for citation in citations if is_new_source(citation["url"], citation["title"])]
+        output = f"Answer: {answer}\n\n"
+        if new_citations:
+            output += "Citations:\n"
+            for citation in new_citations:
+                output += f"- {citation['title']} ({citation['url']})\n"
+        if len(new_citations) < len(citations):
+            output += f"({len(citations) - len(new_citations)} citations already collected earlier in this run omitted)\n"
+        return output
+
+
+class BatchSearchToolSchema(BaseModel):
+    queries: List[str] = Field(description="All of the independent search queries you want to run, at most 5.")
+    source: Literal["exa", "serper"] = Field(default="exa", description="Search backend: 'exa' or 'serper'.")
+
+class BatchSearchTool(BaseTool):
+    name: str = "Batch Search Tool"
+    description: str = ("Run several independent search queries at once and get every result back in order. "
+                         "Prefer this over calling a search tool once per query.")
+    args_schema: Type[BaseModel] = BatchSearchToolSchema
+    exa_tool: EXXAnswerTool = EXXAnswerTool()
+
+    def _run(self, queries: List[str], source: str = "exa") -> str:
+        return budgeted_search(self.name, self._search, queries, source)
+
+    def _search(self, queries: List[str], source: str = "exa") -> str:
+        if isinstance(queries, str):
+            queries = [queries]
+        queries = [str(query) for query in queries][:5]
+        # The batch as a whole counts against the search budget, so the single queries are only traced
+        if source == "exa":
+            search = lambda query: traced_call(self.exa_tool.name, self.exa_tool._answer, query)
+        else:
+            search = lambda query: traced_call("Serper Search", serper_search, query)
+        results = run_concurrently(search, queries)
+        return "\n\n".join(
+            f"### Query {number}: {query}\n{result}"
+            for number, (query, result) in enumerate(zip(queries, results), start=1)
+        )
+
+
+class TracedSerperDevTool(SerperDevTool):
+    base_url: str = os.getenv("SERPER_BASE_URL", "https://google.serper.dev")
+    # Only the research stage draws from the search budget; the analyst's checks are just traced
+    budgeted: bool = True
+
+    def _run(self, *args, **kwargs):
+        run = budgeted_search if self.budgeted else traced_call
+        return run(self.name, rate_limited, "serper", self._limited_run, *args, **kwargs)
+
+    def _limited_run(self, *args, **kwargs):
+        # crewai_tools sends its own request, so the --max-serper slot is taken here, per attempt
+        with provider_slot("serper"):
+            return super()._run(*args, **kwargs)
+
+
+class WebsiteSearchToolSchema(BaseModel):
+    search_query: str = Field(description="What you want to find on the website.")
+    website: str = Field(description="Full URL of the website or article to search.")
+
+class CachedWebsiteSearchTool(BaseTool):
+    # Replaces crewai_tools' WebsiteSearchTool: pages are embedded into a persistent index once and
+    # reused across runs and processes until their content changes.
+    name: str = "Search in a specific website"
+    description: str = "Semantic search over the content of a specific website or article URL."
+    args_schema: Type[BaseModel] = WebsiteSearchToolSchema
+
+    def _run(self, search_query: str, website: str) -> str:
+        return budgeted_search(self.name, self._search, search_query, website)
+
+    def _search(self, search_query: str, website: str) -> str:
+        from website_index import fetch_text, get_index
+
+        url = canonicalize_url(website)
+        index = get_index()
+        try:
+            # The page is fetched once per run however many URL variants point at it
+            embedded = index.index_page(url, fetch_once(website, fetch_text))
+        except requests.exceptions.RequestException as error:
+            print(f"An error occurred: {error}")
+            return f"Could not fetch {url}: {error}"
+        logger.debug("Website index %s for %s", "updated" if embedded else "reused", url)
+        chunks = index.search(url, search_query)
+        if not chunks:
+            return f"No readable content found at {url}."
+        return f"Relevant content from {url}:\n\n" + "\n\n---\n\n".join(chunks)
+
+
+# ---------- Task Descriptions ---------------------
+RESEARCH_TASK_DESCRIPTION = """
+    The primary role of the researcher agent is to gather and compile accurate, reliable data from relevant research 
+    articles. Ensure that the articles are no more than 10 years old (record each publication date so older ones can be
+    filtered out). Your focus should be on collecting key information
+    without delving into analysis or narrative composition. Do no more than 3 - 5 searches in total, and send 
+    independent queries together in a single Batch Search Tool call rather than one at a time. If a tool reports that
+    the search budget is exhausted, stop searching and write up the findings you already have.
+    Please concentrate on the following components:
+
+        1. Article Title(s):
+            - Extract the title(s) of each research article.
+        
+        2. Authors:
+            - List the full names of all authors involved.
+        
+        3. Publication Date:
+            - Record the date each article was published.
+        
+        4. Abstract:
+            - Retrieve the original abstract provided in the article.
+        
+        5. Introduction Overview:
+            - Summarize the main points of the introduction section, and include the source of this summary.
+        
+        6. Research Results:
+            - Extract and list the main outcomes and data points reported.
+        
+        7. Key Findings:
+            - Identify the critical discoveries and conclusions drawn from the research.
+        
+        8. Relevant Citations:
+            - Collect citations that support the core information extracted from the articles.
+        
+        9. Source URLs:
+            - Provide the direct URLs (and DOIs where available) for all articles used.
+            - Please return all collected data as one structured record per article. Focus solely on data collection
+            to ensure the subsequent analyzer and writing agents have a comprehensive and reliable foundation to
+            build upon."""
+
+ANALYSIS_TASK_DESCRIPTION = """ 
+    The analysis agent plays a crucial role in bridging the gap between raw research data and the 
+    final narrative. Your output will serve as the foundation for the writing agent, so clarity and structure are 
+    paramount. Your responsibilities include:
+
+    1. Data Synthesis:
+        - Review all information provided by the researcher agent (article titles, authors, publication dates, abstracts,
+        introduction overviews, research results, key findings, citations, and source URLs).
+        - Identify common themes, patterns, and any inconsistencies across multiple sources.
+    
+    2. Critical Evaluation:
+        - Assess the credibility, relevance, and overall quality of the collected research data.
+        - Evaluate the significance of the findings in relation to the research question, noting strengths, 
+        weaknesses, and any gaps.
+    
+    3. Insight Generation:
+        - Distill your analysis into clear, concise insights and key takeaways.
+        - Connect the dots between disparate pieces of data to create a coherent picture of the research landscape.
+        - Clearly mark areas that may benefit from further exploration.
+        
+    4. Preparation for the Writing Agent:
+        - Return your analysis as the structured record requested, keeping each entry short and specific.
+        - Ensure that your output is comprehensive yet straightforward, providing the writing agent with all necessary 
+        context for crafting the final narrative without additional interpretation."""
+
+WRITING_TASK_DESCRIPTION = """
+        Your role is to transform the structured analysis provided by the analysis agent into a polished, coherent 
+        narrative. Use the analysis agent’s output as your sole source of information, ensuring that you maintain 
+        accuracy while presenting the findings in an engaging manner. Follow these guidelines:
+
+        Review the Analysis Agent’s Output:
+            - Thoroughly read the research analysis summary, which includes the overview, common themes, critical 
+            evaluations, key insights, and any recommendations or identified gaps.
+            - Use this information as the foundation for your narrative, ensuring that no new data or interpretations are 
+            introduced.
+            - The research articles and the analysis are provided as compact JSON records; turn them into prose and
+            never copy the JSON into the report.
+
+        Structure and Formatting:
+            - Format your narrative in Markdown, using clear headings, subheadings, and bullet points where appropriate.
+            - Start with a compelling introduction that sets the context for the research.
+            - Develop a well-organized body that presents the synthesized data, critical evaluations, and insights.
+            - Conclude with a summary that reinforces the key findings and outlines any next steps or areas for further 
+              investigation.
+
+        Clarity and Engagement:
+            - Write in a clear, concise, and engaging style that is accessible to a broad audience.
+            - Ensure that the narrative flows logically from the introduction to the conclusion.
+            - Emphasize the most significant insights and key takeaways derived from the analysis.
+
+        Consistency with Source Data:
+            - Maintain fidelity to the analysis agent’s content; your narrative should be a re-articulation of the 
+                provided analysis, not an expansion with new ideas.
+            - Verify that all the details, such as themes, critical evaluations, and citations, are accurately represented.
+
+
+        By following these guidelines, you will produce a final narrative that effectively communicates the research 
+        findings and insights in a clear, engaging, and well-structured format.
+"""
+
+WRITING_TASK_EXPECTED_OUTPUT = """
+    A polished, comprehensive executive summary of the research findings derived from the research and analysis 
+    agent's output. The summary should be concise, engaging, and focus on the most important aspects of the research.
+    The format must be in Markdown (without using "```" tags) and include the following sections:
+
+        Introduction:
+            - Provide a compelling context for the research, setting the stage for the insights that follow.
+
+        Research Overview:
+            - Article Titles: List the names of the articles.
+            - Authors: Include all the authors involved.
+           -  Publication Dates: State the publication date(s) for the articles.
+            - Abstracts: Present the abstracts as provided in the original articles.
+
+        Detailed Analysis:
+            - Introduction Summaries & Sources: Offer a concise summary of the introduction sections along with
+                source references.
+            - Research Results: Detail the key outcomes and data points from the studies.
+            - Key Findings: Highlight the primary discoveries and conclusions drawn from the research.
+
+        Critical Evaluation & Insights:
+            - Summarize common themes, patterns, and any inconsistencies noted in the data.
+            - Provide clear, actionable insights and recommendations for future exploration based on the analysis.
+
+        Citations:
+            - Include all relevant citations that support the analysis.
+
+        Source URLs:
+            - List the direct URLs for all articles and sources used to compile the final narrative.
+
+    The narrative should follow a logical structure: begin with an engaging introduction, transition into a 
+    well-organized body that presents the synthesized data and critical evaluations, and conclude with a summary that
+    reinforces the key takeaways. Ensure that the content is accurate, cohesive, and accessible to a broad audience."""
+
+
+# ---------- Research Agents Configuration ---------------------
+def build_agents(llm):
+    search_tool = TracedSerperDevTool()
+    website_tool = CachedWebsiteSearchTool()
+
+    research_agent = Agent(
+        role="Deep Research Specialist",
+        goal="Conduct a comprehensive research and gather detailed information",
+        backstory="""Expert researcher skilled at discovering hard-to-find information
+        and connecting complex data points on the {topic}. Specializes in thorough, detailed research 
+        on the {topic}.""",
+        tools=[BatchSearchTool(), search_tool, website_tool],
+        llm=llm,
+        verbose=True,
+        max_iter=15,
+        allow_delegation=False
+    )
+
+    analyst_agent = Agent(
+        role="Research Analyst",
+        goal=("Conduct thorough research on the given {topic}, providing detailed analysis, "
+              "relevant citations, actionable insights, and key findings."
+              "You will also analyze and synthesize research findings"),
+        backstory=(
+            "You are a seasoned research analyst with years of experience in sourcing, verifying, "
+            "and synthesizing complex information. Your expertise enables you to deliver precise, "
+            "well-structured reports that are both insightful and actionable."
+            "You are also skilled at identifying key patterns and insights. You specialize in clear and actionable analysis."
+        ),
+        llm=llm,
+        tools=[TracedSerperDevTool(budgeted=False)],
+        verbose=True,
+        max_iter=10,
+        allow_delegation=False
+    )
+
+    writing_agent = Agent(
+        role='Content Synthesizer',
+        goal="Create clear, structured reports from Research Analyst",
+        backstory="""Expert writer skilled at transforming complex analysis into clear, 
+        engaging content while maintaining technical accuracy""",
+        llm=llm,
+        verbose=True,
+        max_iter=8,
+        allow_delegation=False
+    )
+
+    return research_agent, analyst_agent, writing_agent
+
+
+# ---------- Agent Task Configuration ---------------------
+# Token budget for each task output handed downstream as context (research -> analysis -> writing).
+# The local model gets a tighter default because its context window is much smaller.
+CONTEXT_TOKEN_BUDGETS = {"openai": 6000, "ollama": 2000}
+UPSTREAM_TASKS = ("research_task", "analysis_task")
+
+
+def build_tasks(research_agent, analyst_agent, writing_agent, callback: Optional[Callable[[TaskOutput], None]] = None,
+                output_file: Optional[str] = None, context_budget: Optional[int] = None):
+    def on_task_done(output: TaskOutput):
+        record_task(output)
+        output.raw = strip_reasoning(output.raw)
+        # Downstream tasks read output.raw as their context, so compact it in place before they run.
+        # Structured outputs are cleaned in code and re-serialised as compact JSON; prose outputs
+        # (e.g. when the model's reply could not be parsed into the record) fall back to compaction.
+        structured = getattr(output, "pydantic", None)
+        if isinstance(structured, ResearchFindings):
+            structured = output.pydantic = clean_findings(structured)
+        if structured is not None and output.name in UPSTREAM_TASKS:
+            before = estimate_tokens(output.raw)
+            output.raw = to_context(structured, context_budget)
+            logger.info("Structured %s context: ~%d -> ~%d tokens", output.name, before, estimate_tokens(output.raw))
+        elif context_budget and output.name in UPSTREAM_TASKS:
+            before = estimate_tokens(output.raw)
+            output.raw = compact(output.raw, context_budget)
+            logger.info("Compacted %s context: ~%d -> ~%d tokens", output.name, before, estimate_tokens(output.raw))
+        save_checkpoint(output)
+        if callback is not None:
+            callback(output)
+
+    research_task = Task(
+        name="research_task",
+        description=RESEARCH_TASK_DESCRIPTION,
+        agent=research_agent,
+        expected_output="Detailed research findings following give instructions",
+        output_pydantic=ResearchFindings,
+        callback=on_task_done
+    )
+
+    analysis_task = Task(
+        name="analysis_task",
+        description=ANALYSIS_TASK_DESCRIPTION,
+        agent=analyst_agent,
+        context=[research_task],
+        expected_output="Analysis of research findings and insights",
+        output_pydantic=ResearchAnalysis,
+        callback=on_task_done
+    )
+
+    writing_task = Task(
+        name="writing_task",
+        description=WRITING_TASK_DESCRIPTION,
+        expected_output=WRITING_TASK_EXPECTED_OUTPUT,
+        agent=writing_agent,
+        context=[research_task, analysis_task],
+        callback=on_task_done,
+        output_file=output_file,
+    )
+    return research_task, analysis_task, writing_task
+
+
+# ---------- Crew Configuration ---------------------
+def llm_provider(model_choice: str) -> str:
+    return "ollama" if model_choice == MODEL_CHOICES[1] else "openai"
+
+
+def build_crew(model_choice: str = MODEL_CHOICES[0], callback: Optional[Callable[[TaskOutput], None]] = None,
+               output_file: Optional[str] = None, step_callback: Optional[Callable] = None,
+               stream: bool = False) -> Crew:
+    # Agents share the registry's client for the chosen backend; ResearchLLM itself routes calls to
+    # the fallback backend while that one is down, and back once it recovers.
+    provider = llm_provider(model_choice)
+    llm = registry.get(provider, stream=stream)
+    agents = build_agents(llm)
+    context_budget = int(os.getenv("CONTEXT_TOKEN_BUDGET", CONTEXT_TOKEN_BUDGETS[provider]))
+    return Crew(
+        agents=list(agents),
+        tasks=list(build_tasks(*agents, callback=callback, output_file=output_file, context_budget=context_budget)),
+        process=Process.sequential,
+        step_callback=step_callback,
+        verbose=True,
+    )
+
+
+def resume_crew(model_choice: str, checkpointer: Checkpointer, rerun_from: Optional[str] = None, **kwargs) -> Crew:
+    # Leading tasks with a checkpoint are dropped from the crew and their stored output is attached,
+    # so the remaining tasks read it as context. rerun_from forces that stage (and everything after it)
+    # to run again, e.g. to regenerate the write-up with a different model.
+    crew = build_crew(model_choice, **kwargs)
+    remaining = []
+    for task in crew.tasks:
+        stored = checkpointer.load(task.name)
+        if stored is not None and not remaining and task.name != rerun_from:
+            task.output = TaskOutput(
+                name=task.name,
+                description=task.description,
+                agent=stored["agent"],
+                summary=stored.get("summary"),
+                raw=stored["raw"],
+            )
+            logger.info("Resuming run %s: reusing checkpointed %s", checkpointer.run_id, task.name)
+            continue
+        remaining.append(task)
+
+    if not remaining:
+        raise ValueError(f"Run {checkpointer.run_id} already completed every task; pass rerun_from to redo a stage.")
+    return Crew(
+        agents=crew.agents,
+        tasks=remaining,
+        process=crew.process,
+        step_callback=crew.step_callback,
+        verbose=True,
+    )
@@ -0,0 +1,118 @@
+import contextvars
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from crewai import Crew, Process, Task
+from crewai.tasks.task_output import TaskOutput
+
+from compaction import dedupe, strip_reasoning
+from crew_factory import RESEARCH_TASK_DESCRIPTION, build_agents, build_crew, llm_provider
+from research_models import ResearchFindings
+from llm_backends import registry
+from streaming import current_stream, using_stream
+
+# ---------- Sub-topic Fan-out ---------------------
+"""
+Fan-out mode for broad topics: a planning call splits the topic into K sub-questions, K research
+agents work on them concurrently, and their merged findings replace research_task's output before
+analysis_task and writing_task run as usual.
+"""
+
+logger = logging.getLogger(__name__)
+
+PLANNING_PROMPT = """Split the research topic below into {count} distinct, non-overlapping sub-questions that
+together cover it completely. Reply with one sub-question per line, numbered 1 to {count}, and nothing else.
+
+Topic: {topic}"""
+
+
+def plan_subtopics(topic: str, count: int, llm) -> list:
+    if count <= 1:
+        return [topic]
+    try:
+        reply = llm.call([{"role": "user", "content": PLANNING_PROMPT.format(count=count, topic=topic)}])
+    except Exception as error:
+        logger.warning("Sub-topic planning failed (%s), researching the topic as a whole", error)
+        return [topic]
+    # Drop reasoning blocks from models that emit them, then keep the numbered / bulleted lines
+    reply = strip_reasoning(str(reply))
+    questions = [
+        re.sub(r"^\s*(?:\d+[.)]|[-*])\s*", "", line).strip()
+        for line in reply.splitlines()
+        if re.match(r"^\s*(?:\d+[.)]|[-*])\s+\S", line)
+    ]
+    return questions[:count] or [topic]
+
+
+class FanOutCrew:
+    """Drop-in for a research Crew (exposes `tasks` and `kickoff`) that parallelises the research stage."""
+
+    def __init__(self, model_choice: str, subtopics: int = 3, **build_kwargs):
+        self.model_choice = model_choice
+        self.subtopics = subtopics
+        self.stream = build_kwargs.get("stream", False)
+        self.crew = build_crew(model_choice, **build_kwargs)
+        self.tasks = self.crew.tasks
+
+    def _research(self, question: str, stream=None):
+        # The run stream is thread-local, so each pool thread takes over the caller's: steps and tokens
+        # reach the page and a cancel stops the sub-crews
+        with using_stream(stream):
+            return self._research_question(question)
+
+    def _research_question(self, question: str):
+        # Every sub-question gets its own agent and task: crewai objects are not safe to share across threads
+        research_agent = build_agents(registry.get(llm_provider(self.model_choice), stream=self.stream))[0]
+        task = Task(
+            name="research_subtask",
+            description=RESEARCH_TASK_DESCRIPTION,
+            agent=research_agent,
+            expected_output="Detailed research findings following give instructions",
+            output_pydantic=ResearchFindings,
+        )
+        crew = Crew(agents=[research_agent], tasks=[task], process=Process.sequential,
+                    step_callback=self.crew.step_callback, verbose=True)
+        return crew.kickoff(inputs={"topic": question})
+
+    def kickoff(self, inputs: dict):
+        research_task, *downstream = self.crew.tasks
+        llm = registry.get(llm_provider(self.model_choice))
+        questions = plan_subtopics(inputs["topic"], self.subtopics, llm)
+        logger.info("Fanning out %d research agents: %s", len(questions), questions)
+
+        with ThreadPoolExecutor(max_workers=len(questions)) as pool:
+            # Copy the caller's context so the run trace, checkpointer and cache switch follow each agent
+            stream = current_stream()
+            futures = [pool.submit(contextvars.copy_context().run, self._research, question, stream)
+                       for question in questions]
+            findings = [future.result() for future in futures]
+
+        structured = None
+        if all(isinstance(result.pydantic, ResearchFindings) for result in findings):
+            # Article records are simply pooled; the task callback de-duplicates and filters them
+            structured = ResearchFindings(articles=[article for result in findings for article in result.pydantic.articles])
+            merged = structured.model_dump_json(exclude_none=True)
+        else:
+            merged = dedupe("\n\n".join(
+                f"## Sub-question {number}: {question}\n\n{result.raw}"
+                for number, (question, result) in enumerate(zip(questions, findings), start=1)
+            ))
+        research_task.output = TaskOutput(
+            name=research_task.name,
+            description=research_task.description,
+            agent=research_task.agent.role,
+            raw=merged,
+            pydantic=structured,
+        )
+        # Same bookkeeping as a normal research_task completion: trace, cleaning, checkpoint, UI
+        if research_task.callback is not None:
+            research_task.callback(research_task.output)
+
+        return Crew(
+            agents=[task.agent for task in downstream],
+            tasks=downstream,
+            process=Process.sequential,
+            step_callback=self.crew.step_callback,
+            verbose=True,
+        ).kickoff(inputs=inputs)
@@ -0,0 +1,155 @@
+import contextvars
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, List
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from rate_limit import rate_limited
+from sources import is_new_source
+
+# ---------- Pooled HTTP Session ---------------------
+"""
+One keep-alive session shared by every search tool, plus a helper that fans independent
+queries out over a bounded thread pool and hands the results back in the original order.
+"""
+
+REQUEST_TIMEOUT = float(os.getenv("SEARCH_TIMEOUT", 30))
+MAX_SEARCH_WORKERS = int(os.getenv("MAX_SEARCH_WORKERS", 5))
+
+SERPER_URL = os.getenv("SERPER_BASE_URL", "https://google.serper.dev") + "/search"
+
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "deepseek-r1:latest")
+# How long Ollama keeps the model loaded after a request; CPU-only boxes pay a long load for every eviction
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "60m")
+
+logger = logging.getLogger(__name__)
+
+
+def _build_session() -> requests.Session:
+    http = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(MAX_SEARCH_WORKERS, 10))
+    http.mount("https://", adapter)
+    http.mount("http://", adapter)
+    return http
+
+
+session = _build_session()
+
+
+# ---------- Provider Concurrency Limits ---------------------
+# Caps on how many requests may be in flight per backend at once. Each slot is taken per request (LLM
+# calls in ResearchLLM.call, searches in limited_request), so the Streamlit queue, batch mode and
+# fan-out sub-crews all share one cap. Override with e.g. EXA_MAX_CONCURRENCY=4 or set_provider_limit("exa", 4).
+PROVIDERS = ("openai", "ollama", "exa", "serper")
+# Ollama defaults to the server's own OLLAMA_NUM_PARALLEL, so requests never queue inside the server.
+_DEFAULT_LIMITS = {"openai": 8, "ollama": int(os.getenv("OLLAMA_NUM_PARALLEL", 1)), "exa": 5, "serper": 5}
+_provider_slots = {}
+_slots_lock = threading.Lock()
+
+
+def set_provider_limit(provider: str, limit: int):
+    with _slots_lock:
+        _provider_slots[provider] = threading.BoundedSemaphore(max(1, int(limit)))
+
+
+def provider_slot(provider: str) -> threading.BoundedSemaphore:
+    with _slots_lock:
+        if provider not in _provider_slots:
+            limit = os.getenv(f"{provider.upper()}_MAX_CONCURRENCY", _DEFAULT_LIMITS.get(provider, 4))
+            _provider_slots[provider] = threading.BoundedSemaphore(max(1, int(limit)))
+        return _provider_slots[provider]
+
+
+def run_concurrently(fn: Callable[[str], str], queries: List[str], max_workers: int = MAX_SEARCH_WORKERS,
+                     timeout: float = REQUEST_TIMEOUT) -> List[str]:
+    # Results come back in the same order as `queries`; a failed or slow query yields an error string
+    # instead of sinking the whole batch.
+    if not queries:
+        return []
+    results = []
+    pool = ThreadPoolExecutor(max_workers=min(max_workers, len(queries)))
+    try:
+        # Each worker runs in a copy of the caller's context so the active run trace follows the query.
+        futures = [pool.submit(contextvars.copy_context().run, fn, query) for query in queries]
+        wait(futures, timeout=timeout)
+        for query, future in zip(queries, futures):
+            if not future.done():
+                future.cancel()
+                results.append(f"Search timed out after {timeout:.0f}s: {query}")
+                continue
+            try:
+                results.append(future.result())
+            except Exception as error:
+                print(f"An error occurred for query {query!r}: {error}")
+                results.append(f"Search failed for {query!r}: {error}")
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    return results
+
+
+def limited_request(provider: str, method: str, url: str, timeout: float = REQUEST_TIMEOUT,
+                    **kwargs) -> requests.Response:
+    # One rate-limited, retried request; the concurrency slot is only held while the request is in flight
+    def send():
+        with provider_slot(provider):
+            response = session.request(method, url, timeout=timeout, **kwargs)
+        response.raise_for_status()
+        return response
+
+    return rate_limited(provider, send)
+
+
+def serper_search(query: str, num_results: int = 5) -> str:
+    response = limited_request(
+        "serper", "POST", SERPER_URL,
+        json={"q": query, "num": num_results},
+        headers={"X-API-KEY": os.getenv("SERPER_API_KEY", ""), "content-type": "application/json"},
+    )
+    output = f"Search results for: {query}\n"
+    results = response.json().get("organic", [])[:num_results]
+    fresh = [result for result in results if is_new_source(result.get("link", ""), result.get("title", ""))]
+    for result in fresh:
+        output += f"- {result.get('title')} ({result.get('link')})\n  {result.get('snippet', '')}\n"
+    if len(fresh) < len(results):
+        output += f"({len(results) - len(fresh)} results already collected earlier in this run omitted)\n"
+    return output
+
+
+# ---------- Local Model Warm-up ---------------------
+# Plain HTTP, no crewai / litellm, so the Streamlit page can trigger it without the heavy imports.
+_warm_state = {"started": False}
+_warm_lock = threading.Lock()
+
+
+def _warm_ollama():
+    # An empty prompt loads the model into memory without generating anything
+    try:
+        response = session.post(
+            f"{OLLAMA_BASE_URL}/api/generate",
+            json={"model": OLLAMA_MODEL, "prompt": "", "keep_alive": OLLAMA_KEEP_ALIVE, "stream": False},
+            timeout=600,
+        )
+        response.raise_for_status()
+        logger.info("Ollama model %s loaded (keep_alive=%s)", OLLAMA_MODEL, OLLAMA_KEEP_ALIVE)
+    except requests.exceptions.RequestException as error:
+        logger.warning("Could not preload Ollama model %s: %s", OLLAMA_MODEL, error)
+        # Let the next run try again, e.g. once the Ollama server is up
+        with _warm_lock:
+            _warm_state["started"] = False
+
+
+def warm_ollama(background: bool = True):
+    # Start loading the local model once per process, so the first call of a run does not pay for it
+    with _warm_lock:
+        if _warm_state["started"]:
+            return
+        _warm_state["started"] = True
+    if background:
+        threading.Thread(target=_warm_ollama, name="ollama-warmup", daemon=True).start()
+    else:
+        _warm_ollama()
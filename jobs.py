@@ -0,0 +1,288 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Optional
+
+from checkpoints import Checkpointer
+from report_store import ReportStore
+
+# ---------- Research Job Queue ---------------------
+"""
+SQLite-backed job queue served by a bounded pool of worker threads. The Streamlit page only
+submits jobs and polls their status, so long kickoffs never block a session, at most JOB_WORKERS
+crews run at once, and queued or interrupted jobs survive a server restart (interrupted ones
+resume from their task checkpoints). Several server processes may share one database: each running
+job records its owner and a heartbeat, and only jobs whose owner stopped heartbeating are requeued.
+Workers keep the run's live output (recent steps, streamed
+tokens, finished task outputs) in the database, so the polling page renders it as it arrives.
+"""
+
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", os.path.join(os.getenv("RESEARCH_CACHE_DIR", ".research_cache"), "jobs.sqlite3"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+POLL_INTERVAL = 1.0
+FLUSH_INTERVAL = 0.5
+HEARTBEAT_INTERVAL = 10.0
+STALE_AFTER = float(os.getenv("JOB_STALE_SECONDS", 60))
+MAX_TOKEN_CHARS = 2000
+FINISHED = ("done", "failed", "cancelled")
+
+_COLUMNS = ("id", "topic", "model", "subtopics", "use_cache", "rerun_from", "status", "progress",
+            "tasks_done", "tasks_total", "tokens", "cancel_requested", "error", "created", "started", "finished",
+            "owner", "heartbeat")
+
+_ADDED_COLUMNS = {"tokens": "TEXT NOT NULL DEFAULT ''", "owner": "TEXT", "heartbeat": "REAL"}
+
+
+class JobQueue:
+    def __init__(self, workers: int = JOB_WORKERS, path: str = JOB_DB_PATH, store: Optional[ReportStore] = None):
+        self.store = store or ReportStore()
+        self.owner = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                topic TEXT NOT NULL,
+                model TEXT NOT NULL,
+                subtopics INTEGER NOT NULL DEFAULT 1,
+                use_cache INTEGER NOT NULL DEFAULT 1,
+                rerun_from TEXT,
+                status TEXT NOT NULL,
+                progress TEXT NOT NULL DEFAULT '',
+                tasks_done INTEGER NOT NULL DEFAULT 0,
+                tasks_total INTEGER NOT NULL DEFAULT 0,
+                tokens TEXT NOT NULL DEFAULT '',
+                cancel_requested INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                created REAL NOT NULL,
+                started REAL,
+                finished REAL,
+                owner TEXT,
+                heartbeat REAL
+            )"""
+        )
+        # Databases created by an older version get the columns added since
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for name, definition in _ADDED_COLUMNS.items():
+            if name not in existing:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {definition}")
+        self._conn.executescript(
+            """CREATE TABLE IF NOT EXISTS job_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_job_events ON job_events (job_id, id);"""
+        )
+        self._conn.commit()
+        self._requeue_stale()
+
+        self._stop = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"research-worker-{number}", daemon=True)
+            for number in range(max(1, workers))
+        ] + [threading.Thread(target=self._heartbeat, name="research-heartbeat", daemon=True)]
+        for thread in self._threads:
+            thread.start()
+
+    # ---------- Submission & Polling ---------------------
+    def submit(self, topic: str, model: str, subtopics: int = 1, use_cache: bool = True,
+               job_id: str = None, rerun_from: str = None) -> str:
+        # Resubmitting a run that is still queued or running is a no-op: two workers on one run ID
+        # would write the same checkpoints and trace.
+        job_id = job_id or uuid.uuid4().hex[:12]
+        with self._lock:
+            row = self._conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is not None and row[0] in ("queued", "running"):
+                return job_id
+            # A resumed or re-run job starts with a clean event log; _run_job replays the reused stages
+            self._conn.execute("DELETE FROM job_events WHERE job_id = ?", (job_id,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (id, topic, model, subtopics, use_cache, rerun_from, status, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, 'queued', ?)",
+                (job_id, topic, model, subtopics, int(use_cache), rerun_from, time.time()),
+            )
+            self._conn.commit()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(zip(_COLUMNS, row)) if row else None
+
+    def queue_position(self, job_id: str) -> Optional[int]:
+        # 1-based position among queued jobs, None once the job has been picked up
+        job = self.get(job_id)
+        if job is None or job["status"] != "queued":
+            return None
+        with self._lock:
+            (ahead,) = self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created < ?", (job["created"],)
+            ).fetchone()
+        return ahead + 1
+
+    def cancel(self, job_id: str):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET cancel_requested = 1, "
+                "status = CASE WHEN status = 'queued' THEN 'cancelled' ELSE status END WHERE id = ?",
+                (job_id,),
+            )
+            self._conn.commit()
+
+    def events(self, job_id: str) -> list:
+        # (kind, payload) pairs in order: finished task outputs, and the steps of the task in progress
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT kind, payload FROM job_events WHERE job_id = ? ORDER BY id", (job_id,)
+            ).fetchall()
+        return [(kind, json.loads(payload)) for kind, payload in rows]
+
+    def _add_event(self, job_id: str, kind: str, payload):
+        with self._lock:
+            if kind == "task":
+                # Steps of a finished task are no longer shown, so they are not kept either
+                self._conn.execute("DELETE FROM job_events WHERE job_id = ? AND kind = 'step'", (job_id,))
+            self._conn.execute("INSERT INTO job_events (job_id, kind, payload) VALUES (?, ?, ?)",
+                               (job_id, kind, json.dumps(payload)))
+            self._conn.commit()
+
+    def result(self, job_id: str) -> Optional[str]:
+        return self.store.get(job_id)
+
+    def _update(self, job_id: str, **fields):
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+            self._conn.commit()
+
+    def _claim(self) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            claimed = self._conn.execute(
+                "UPDATE jobs SET status = 'running', started = ?, owner = ?, heartbeat = ? "
+                "WHERE id = ? AND status = 'queued'",
+                (time.time(), self.owner, time.time(), row[0]),
+            ).rowcount
+            self._conn.commit()
+        return self.get(row[0]) if claimed else None
+
+    def _requeue_stale(self):
+        # Running jobs whose owner stopped heartbeating (its process died) go back to the queue and
+        # resume from their checkpoints; jobs of live processes are left alone
+        with self._lock:
+            requeued = self._conn.execute(
+                "UPDATE jobs SET status = 'queued', owner = NULL "
+                "WHERE status = 'running' AND (heartbeat IS NULL OR heartbeat < ?)",
+                (time.time() - STALE_AFTER,),
+            ).rowcount
+            self._conn.commit()
+        if requeued:
+            print(f"Requeued {requeued} interrupted research job(s)")
+
+    def _heartbeat(self):
+        while not self._stop.wait(HEARTBEAT_INTERVAL):
+            with self._lock:
+                self._conn.execute("UPDATE jobs SET heartbeat = ? WHERE status = 'running' AND owner = ?",
+                                   (time.time(), self.owner))
+                self._conn.commit()
+            self._requeue_stale()
+
+    # ---------- Workers ---------------------
+    def _worker(self):
+        while not self._stop.is_set():
+            job = self._claim()
+            if job is None:
+                self._stop.wait(POLL_INTERVAL)
+                continue
+            try:
+                self._run_job(job)
+            except Exception as error:
+                print(f"An error occurred: {error}")
+                self._update(job["id"], status="failed", error=str(error), finished=time.time())
+
+    def _build_crew(self, job: dict, checkpointer: Checkpointer):
+        from crew_factory import build_crew, resume_crew
+        from streaming import step_callback, task_callback
+
+        kwargs = {"callback": task_callback, "step_callback": step_callback, "stream": True}
+        if checkpointer.completed() or job["rerun_from"]:
+            return resume_crew(job["model"], checkpointer, rerun_from=job["rerun_from"], **kwargs)
+        if job["subtopics"] > 1:
+            from fanout import FanOutCrew
+            return FanOutCrew(job["model"], job["subtopics"], **kwargs)
+        return build_crew(job["model"], **kwargs)
+
+    def _run_job(self, job: dict):
+        from streaming import RunStream
+        from tracing import RunTrace
+
+        # The job ID doubles as the run ID for checkpoints, the trace and the stored report
+        checkpointer = Checkpointer(job["id"])
+        checkpointer.save_meta(topic=job["topic"], model=job["model"])
+        crew = self._build_crew(job, checkpointer)
+        # Resumed crews only hold their unfinished tasks; stages reused from checkpoints are shown (once)
+        # as finished and counted as done. Checkpoints store the same fields as task events.
+        remaining = {task.name for task in crew.tasks}
+        reused = sorted((checkpointer.load(name) for name in checkpointer.completed() if name not in remaining),
+                        key=lambda stored: stored.get("saved", 0))
+        with self._lock:
+            self._conn.execute("DELETE FROM job_events WHERE job_id = ?", (job["id"],))
+            self._conn.commit()
+        for stored in reused:
+            self._add_event(job["id"], "task", stored)
+        tasks_done = len(reused)
+        self._update(job["id"], tasks_done=tasks_done, tasks_total=tasks_done + len(crew.tasks), progress="Starting",
+                     tokens="")
+
+        trace = RunTrace(topic=job["topic"], model=job["model"], run_id=job["id"])
+        stream = RunStream().start(crew, {"topic": job["topic"]}, trace=trace, use_cache=bool(job["use_cache"]),
+                                   checkpointer=checkpointer, store=self.store)
+
+        tokens, last_flush = "", 0.0
+        for kind, payload in stream.iter_events():
+            # Tokens arrive many times a second, so they and the cancel flag are synced at most every FLUSH_INTERVAL
+            now = time.monotonic()
+            if kind == "token":
+                tokens = (tokens + payload)[-MAX_TOKEN_CHARS:]
+                if now - last_flush < FLUSH_INTERVAL:
+                    continue
+            if now - last_flush >= FLUSH_INTERVAL:
+                last_flush = now
+                self._update(job["id"], tokens=tokens)
+                if (self.get(job["id"]) or {}).get("cancel_requested"):
+                    stream.cancel()
+            if kind == "step":
+                self._add_event(job["id"], "step", payload)
+                self._update(job["id"], progress=payload[:500])
+            elif kind == "task":
+                tasks_done += 1
+                tokens = ""
+                self._add_event(job["id"], "task", {
+                    "name": payload.name,
+                    "agent": str(payload.agent),
+                    "description": payload.description,
+                    "summary": payload.summary,
+                    "raw": payload.raw,
+                })
+                self._update(job["id"], tasks_done=tasks_done, tokens="", progress=f"Finished {payload.name}")
+            elif kind == "done":
+                self._update(job["id"], status="done", progress="Research complete", finished=time.time())
+            elif kind == "cancelled":
+                self._update(job["id"], status="cancelled", progress="Cancelled", finished=time.time())
+            elif kind == "error":
+                self._update(job["id"], status="failed", error=str(payload), finished=time.time())
+
+    def shutdown(self):
+        self._stop.set()
@@ -0,0 +1,225 @@
+import logging
+import os
+import threading
+import time
+
+import litellm
+import requests
+from crewai import LLM
+
+from cache import ResponseCache, cache_bypassed, make_key
+from compaction import strip_reasoning
+from http_client import OLLAMA_BASE_URL, OLLAMA_KEEP_ALIVE, OLLAMA_MODEL, provider_slot, session, warm_ollama
+from rate_limit import limiter, rate_limited
+from tracing import active_trace
+
+# ---------- LLM Backend Registry ---------------------
+"""
+One LLM client per backend (and streaming mode), built on first use and reused by every agent and
+crew in the process. Backend health is probed cheaply and cached for a short TTL, and a call that
+fails on a degraded backend is retried once on the other one (OpenAI <-> local Ollama).
+"""
+
+logger = logging.getLogger(__name__)
+
+OLLAMA_NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", 0))
+HEALTH_TTL = float(os.getenv("LLM_HEALTH_TTL", 30))
+FALLBACKS = {"openai": "ollama", "ollama": "openai"}
+if os.getenv("LLM_FAILOVER", "1") == "0":
+    FALLBACKS = {}
+
+# Errors that mean "this backend is down or saturated", as opposed to a bad request
+FAILOVER_ERRORS = tuple(
+    error for error in (
+        getattr(litellm, name, None) for name in
+        ("APIConnectionError", "ServiceUnavailableError", "RateLimitError", "Timeout", "InternalServerError")
+    ) if isinstance(error, type)
+) + (requests.exceptions.ConnectionError,)
+
+
+# ---------- Health Checks ---------------------
+def check_ollama_availability() -> bool:
+    try:
+        response = session.get(f"{OLLAMA_BASE_URL}/api/version", timeout=2)
+        return response.status_code == 200
+    except requests.exceptions.RequestException:
+        return False
+
+
+def check_openai_availability() -> bool:
+    # No network round-trip: a missing key is the common failure, outages surface as call errors
+    return bool(os.getenv("OPENAI_API_KEY"))
+
+
+HEALTH_CHECKS = {"openai": check_openai_availability, "ollama": check_ollama_availability}
+_health = {}
+_health_lock = threading.Lock()
+
+
+def is_healthy(provider: str) -> bool:
+    now = time.monotonic()
+    with _health_lock:
+        cached = _health.get(provider)
+        if cached is not None and now - cached[1] < HEALTH_TTL:
+            return cached[0]
+    healthy = HEALTH_CHECKS[provider]()
+    with _health_lock:
+        _health[provider] = (healthy, now)
+    return healthy
+
+
+def mark_unhealthy(provider: str):
+    with _health_lock:
+        _health[provider] = (False, time.monotonic())
+
+
+# ---------- Research LLM ---------------------
+# Exact-match response cache keyed on model, temperature, the full message list and offered tools.
+# Set LLM_CACHE=0 to turn it off, or wrap a run in cache.bypass_cache() to skip lookups for that run.
+llm_cache = ResponseCache(
+    "llm",
+    ttl=float(os.getenv("LLM_CACHE_TTL", 7 * 24 * 60 * 60)),
+    max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", 20000)),
+) if os.getenv("LLM_CACHE", "1") != "0" else None
+
+
+class ResearchLLM(LLM):
+    # Serves repeated calls from llm_cache, fails over to the other backend when this one is down,
+    # and records latency, token counts and estimated cost of every call into the active run trace.
+    provider: str = "openai"
+    streaming: bool = False
+
+    def __init__(self, *args, provider: str = "openai", streaming: bool = False, **kwargs):
+        # Taken out of kwargs so they don't reach litellm as completion parameters
+        super().__init__(*args, stream=streaming, **kwargs)
+        self.provider = provider
+        self.streaming = streaming
+
+    def call(self, messages, *args, **kwargs):
+        trace = active_trace()
+        cache_key = None
+        if llm_cache is not None:
+            cache_key = make_key(self.model, self.temperature, messages, kwargs.get("tools"))
+            cached = None if cache_bypassed() else llm_cache.get(cache_key)
+            if cached is not None:
+                if trace is not None:
+                    trace.record_llm(self.model, 0.0, 0, 0, 0.0, cached=True)
+                return cached
+
+        fallback = FALLBACKS.get(self.provider)
+        if fallback and not is_healthy(self.provider) and is_healthy(fallback):
+            logger.warning("%s backend unavailable, routing call to %s", self.provider, fallback)
+            return registry.get(fallback, stream=self.streaming).call(messages, *args, **kwargs)
+
+        if isinstance(messages, str):
+            messages = [{"role": "user", "content": messages}]
+        try:
+            prompt_tokens = litellm.token_counter(model=self.model, messages=messages)
+        except Exception:
+            prompt_tokens = 0
+
+        backend_call = super().call
+
+        def limited_call(*call_args, **call_kwargs):
+            # The provider's concurrency slot is held for the request only, not across retry back-off
+            with provider_slot(self.provider):
+                return backend_call(*call_args, **call_kwargs)
+
+        started = time.perf_counter()
+        try:
+            # Waits for the provider's request and token buckets, retries 429 / 5xx with backoff, and only
+            # fails over once the retries are used up
+            result = rate_limited(self.provider, limited_call, messages, *args, tokens=prompt_tokens, **kwargs)
+        except FAILOVER_ERRORS as error:
+            mark_unhealthy(self.provider)
+            if not fallback or not is_healthy(fallback):
+                raise
+            logger.warning("%s call failed (%s), retrying on %s", self.provider, error, fallback)
+            return registry.get(fallback, stream=self.streaming).call(messages, *args, **kwargs)
+        seconds = time.perf_counter() - started
+        if isinstance(result, str):
+            # DeepSeek-R1's <think> block never reaches the agents' context, the cache or the task outputs
+            result = strip_reasoning(result)
+
+        if cache_key is not None and isinstance(result, str) and result.strip():
+            llm_cache.set(cache_key, result)
+        try:
+            completion_tokens = litellm.token_counter(model=self.model, text=str(result))
+        except Exception:
+            completion_tokens = 0
+        # Completion tokens are only known now; charge them so later callers wait their share
+        token_bucket = limiter(self.provider).tokens
+        if token_bucket is not None:
+            token_bucket.debit(completion_tokens)
+        if trace is None:
+            return result
+
+        try:
+            prompt_cost, completion_cost = litellm.cost_per_token(
+                model=self.model, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens
+            )
+            cost = prompt_cost + completion_cost
+        except Exception:  # local models have no price entry
+            cost = 0.0
+        trace.record_llm(self.model, seconds, prompt_tokens, completion_tokens, cost)
+        return result
+
+
+# ---------- Registry ---------------------
+def _build_llm(provider: str, stream: bool) -> ResearchLLM:
+    # stream=True makes crewai emit LLMStreamChunkEvents; job workers write them to the job row, where the
+    # polling Streamlit page picks them up
+    if provider == "openai":
+        llm = ResearchLLM(
+            model="gpt-4o-mini",
+            api_key=os.getenv("OPENAI_API_KEY"),
+            base_url=os.getenv("OPENAI_BASE_URL"),
+            provider=provider,
+            streaming=stream,
+        )
+    else:
+        warm_ollama()
+        options = {"num_ctx": OLLAMA_NUM_CTX} if OLLAMA_NUM_CTX else {}
+        llm = ResearchLLM(
+            model=f"ollama/{OLLAMA_MODEL}",
+            base_url=OLLAMA_BASE_URL,
+            temperature=0.7,
+            provider=provider,
+            streaming=stream,
+            keep_alive=OLLAMA_KEEP_ALIVE,
+            **options,
+        )
+    if not isinstance(llm, ResearchLLM):
+        # Tracing, caching, failover and rate limits all live in ResearchLLM.call
+        raise RuntimeError(f"crewai returned {type(llm).__name__} instead of ResearchLLM; install crewai<1.0")
+    return llm
+
+
+class BackendRegistry:
+    def __init__(self):
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def get(self, provider: str, stream: bool = False) -> ResearchLLM:
+        with self._lock:
+            key = (provider, stream)
+            if key not in self._clients:
+                self._clients[key] = _build_llm(provider, stream)
+            return self._clients[key]
+
+    def resolve(self, preferred: str) -> str:
+        # The preferred backend if it is healthy, else its healthy fallback, else the preferred one anyway
+        if is_healthy(preferred):
+            return preferred
+        fallback = FALLBACKS.get(preferred)
+        if fallback and is_healthy(fallback):
+            logger.warning("%s backend unavailable, using %s", preferred, fallback)
+            return fallback
+        return preferred
+
+
+registry = BackendRegistry()
+
+
+def get_llm(gpt=True, stream=False) -> ResearchLLM:
+    return registry.get("openai" if gpt else "ollama", stream=stream)
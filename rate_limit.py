@@ -0,0 +1,150 @@
+import logging
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+
+# ---------- Provider Rate Limits ---------------------
+"""
+Process-wide token buckets per provider (requests and tokens per minute) and a retry wrapper with
+jittered exponential backoff. Every outbound EXA, Serper, website, embedding and LLM call goes through
+rate_limited(), so concurrent crews share one budget per provider, and a 429 or transient 5xx is
+retried (honouring Retry-After) instead of aborting a kickoff that has been running for minutes.
+"""
+
+logger = logging.getLogger(__name__)
+
+# Requests and tokens per minute; override with e.g. EXA_RPM=120 or OPENAI_TPM=400000, 0 means unlimited.
+_DEFAULT_RPM = {"openai": 500, "ollama": 0, "exa": 300, "serper": 300, "website": 120, "embeddings": 3000}
+_DEFAULT_TPM = {"openai": 200000}
+MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", 4))
+BACKOFF_BASE = float(os.getenv("RATE_LIMIT_BACKOFF_BASE", 1.0))
+BACKOFF_MAX = float(os.getenv("RATE_LIMIT_BACKOFF_MAX", 60))
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount: float = 1):
+        # Blocks until `amount` tokens are available; requests larger than the bucket wait for a full one
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def debit(self, amount: float):
+        # Charge usage only known after the call (e.g. completion tokens); may leave the bucket in debt
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= amount
+
+
+class ProviderLimiter:
+    def __init__(self, provider: str):
+        self.provider = provider
+        rpm = float(os.getenv(f"{provider.upper()}_RPM", _DEFAULT_RPM.get(provider, 0)))
+        tpm = float(os.getenv(f"{provider.upper()}_TPM", _DEFAULT_TPM.get(provider, 0)))
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int = 0):
+        # A Retry-After from one call pauses every caller of the provider, not just the one that got it
+        with self._lock:
+            pause = self.paused_until - time.monotonic()
+        if pause > 0:
+            time.sleep(pause)
+        if self.requests is not None:
+            self.requests.acquire()
+        if self.tokens is not None and tokens:
+            self.tokens.acquire(tokens)
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def limiter(provider: str) -> ProviderLimiter:
+    with _limiters_lock:
+        if provider not in _limiters:
+            _limiters[provider] = ProviderLimiter(provider)
+        return _limiters[provider]
+
+
+# ---------- Retry & Backoff ---------------------
+def _error_response(error: Exception):
+    # requests errors carry .response; litellm / openai errors carry .response (httpx) and .status_code
+    return getattr(error, "response", None)
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(_error_response(error), "status_code", None)
+    return status in RETRY_STATUSES
+
+
+def retry_after(error: Exception):
+    headers = getattr(_error_response(error), "headers", None) or {}
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int) -> float:
+    # Full jitter: spreads the retries of concurrent callers instead of syncing them up
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def rate_limited(provider: str, fn, *args, tokens: int = 0, **kwargs):
+    provider_limiter = limiter(provider)
+    attempt = 0
+    while True:
+        provider_limiter.acquire(tokens)
+        try:
+            return fn(*args, **kwargs)
+        except Exception as error:
+            if attempt >= MAX_RETRIES or not is_retryable(error):
+                raise
+            delay = retry_after(error)
+            if delay is not None:
+                provider_limiter.pause(delay)
+                delay += random.uniform(0, BACKOFF_BASE)
+            else:
+                delay = backoff_delay(attempt)
+            attempt += 1
+            logger.warning("%s call failed (%s), retry %d/%d in %.1fs", provider, error, attempt, MAX_RETRIES, delay)
+            time.sleep(delay)
@@ -0,0 +1,101 @@
+import gzip
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Optional
+
+from cache import normalize_query
+
+# ---------- Report Store ---------------------
+"""
+Run-scoped storage for finished reports. Every report is written atomically to its own file named
+after the run ID (optionally gzip-compressed) and indexed in SQLite by normalized topic, model and
+date, so concurrent sessions never overwrite each other and a fresh report for a popular topic can
+be served without launching a new crew.
+"""
+
+REPORT_STORE_DIR = os.getenv("REPORT_STORE_DIR", "report_store")
+REPORT_MAX_AGE = float(os.getenv("REPORT_MAX_AGE_HOURS", 24)) * 60 * 60
+
+
+class ReportStore:
+    def __init__(self, directory: str = REPORT_STORE_DIR, compress: bool = None):
+        self.directory = directory
+        self.compress = compress if compress is not None else os.getenv("REPORT_COMPRESS", "0") == "1"
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(directory, "index.sqlite3"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS reports (
+                run_id TEXT PRIMARY KEY,
+                topic_key TEXT NOT NULL,
+                topic TEXT NOT NULL,
+                model TEXT NOT NULL,
+                created REAL NOT NULL,
+                path TEXT NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_topic_model ON reports (topic_key, model, created)")
+        self._conn.commit()
+
+    def save(self, run_id: str, topic: str, model: str, text: str) -> str:
+        path = os.path.join(self.directory, f"{run_id}.md" + (".gz" if self.compress else ""))
+        data = text.encode("utf-8")
+        if self.compress:
+            data = gzip.compress(data)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO reports (run_id, topic_key, topic, model, created, path) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (run_id, normalize_query(topic), topic, model, time.time(), path),
+            )
+            self._conn.commit()
+        return path
+
+    def read(self, path: str) -> str:
+        with open(path, "rb") as handle:
+            data = handle.read()
+        if path.endswith(".gz"):
+            data = gzip.decompress(data)
+        return data.decode("utf-8")
+
+    def search(self, topic: str = None, model: str = None, since: float = None, limit: int = 20) -> list:
+        clauses, params = [], []
+        if topic:
+            clauses.append("topic_key = ?")
+            params.append(normalize_query(topic))
+        if model:
+            clauses.append("model = ?")
+            params.append(model)
+        if since:
+            clauses.append("created >= ?")
+            params.append(since)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT run_id, topic, model, created, path FROM reports {where} ORDER BY created DESC LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+        return [dict(zip(("run_id", "topic", "model", "created", "path"), row)) for row in rows]
+
+    def find_fresh(self, topic: str, model: str, max_age: float = REPORT_MAX_AGE) -> Optional[dict]:
+        # Newest report for this topic and model that is young enough to serve as-is
+        for entry in self.search(topic=topic, model=model, since=time.time() - max_age, limit=5):
+            if os.path.exists(entry["path"]):
+                return {**entry, "text": self.read(entry["path"])}
+        return None
+
+    def get(self, run_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT path FROM reports WHERE run_id = ?", (run_id,)).fetchone()
+        if row is None or not os.path.exists(row[0]):
+            return None
+        return self.read(row[0])
@@ -0,0 +1,104 @@
+import datetime
+import os
+import re
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+from cache import normalize_query
+from compaction import TRIM_MARKER, estimate_tokens
+from sources import canonicalize_url
+
+# ---------- Structured Task Outputs ---------------------
+"""
+Pydantic records emitted by research_task and analysis_task instead of free-form Markdown. Articles
+are de-duplicated by DOI / canonical URL / title and filtered by publication year in code, and the
+records are handed downstream as compact JSON, which costs far fewer prompt tokens than the prose.
+"""
+
+MAX_ARTICLE_AGE_YEARS = int(os.getenv("MAX_ARTICLE_AGE_YEARS", 10))
+_YEAR = re.compile(r"\b(19\d{2}|20\d{2})\b")
+
+
+class ResearchArticle(BaseModel):
+    title: str = Field(description="Title of the research article.")
+    authors: List[str] = Field(default_factory=list, description="Full names of all authors.")
+    published: Optional[str] = Field(default=None, description="Publication date, e.g. 2021-06 or 2021.")
+    doi: Optional[str] = Field(default=None, description="DOI of the article, if it has one.")
+    url: Optional[str] = Field(default=None, description="Direct URL of the article.")
+    abstract: Optional[str] = Field(default=None, description="The original abstract.")
+    introduction_summary: Optional[str] = Field(default=None, description="Main points of the introduction.")
+    results: List[str] = Field(default_factory=list, description="Main outcomes and data points reported.")
+    key_findings: List[str] = Field(default_factory=list, description="Critical discoveries and conclusions.")
+    citations: List[str] = Field(default_factory=list, description="Citations supporting the extracted information.")
+
+    def publication_year(self) -> Optional[int]:
+        match = _YEAR.search(self.published or "")
+        return int(match.group(1)) if match else None
+
+    def source_key(self) -> str:
+        if self.doi:
+            return canonicalize_url(self.doi if self.doi.lower().startswith(("doi:", "http")) else f"doi:{self.doi}")
+        if self.url:
+            return canonicalize_url(self.url)
+        return "title:" + normalize_query(self.title)
+
+
+class ResearchFindings(BaseModel):
+    articles: List[ResearchArticle] = Field(default_factory=list, description="One record per research article.")
+
+
+class ResearchAnalysis(BaseModel):
+    overview: str = Field(description="Short overview of the research landscape for the topic.")
+    themes: List[str] = Field(default_factory=list, description="Common themes and patterns across sources.")
+    inconsistencies: List[str] = Field(default_factory=list, description="Conflicts or inconsistencies between sources.")
+    evaluation: List[str] = Field(default_factory=list,
+                                  description="Credibility, relevance, strengths and weaknesses of the evidence.")
+    insights: List[str] = Field(default_factory=list, description="Key insights and takeaways.")
+    gaps: List[str] = Field(default_factory=list, description="Gaps and areas for further exploration.")
+    sources: List[str] = Field(default_factory=list, description="URLs or DOIs of the sources the analysis relies on.")
+
+
+# ---------- Cleaning & Context ---------------------
+def clean_findings(findings: ResearchFindings, max_age_years: int = MAX_ARTICLE_AGE_YEARS) -> ResearchFindings:
+    # Merge duplicate articles (filling gaps from later copies) and drop ones older than max_age_years.
+    # Articles without a recognisable year are kept rather than guessed at.
+    oldest = datetime.date.today().year - max_age_years
+    merged = {}
+    for article in findings.articles:
+        year = article.publication_year()
+        if max_age_years and year is not None and year < oldest:
+            continue
+        key = article.source_key()
+        if key not in merged:
+            merged[key] = article.model_copy(deep=True)
+            continue
+        kept = merged[key]
+        for name, value in article:
+            current = getattr(kept, name)
+            if isinstance(current, list):
+                current.extend(item for item in value if item not in current)
+            elif not current and value:
+                setattr(kept, name, value)
+    return ResearchFindings(articles=list(merged.values()))
+
+
+def _shorten(value, max_chars: int):
+    if isinstance(value, str) and len(value) > max_chars:
+        return value[:max_chars] + TRIM_MARKER
+    if isinstance(value, list):
+        return [_shorten(item, max_chars) for item in value]
+    if isinstance(value, dict):
+        return {key: _shorten(item, max_chars) for key, item in value.items()}
+    return value
+
+
+def to_context(record: BaseModel, token_budget: Optional[int] = None) -> str:
+    # Compact JSON for downstream tasks; long text fields are cut shorter until it fits the budget
+    text = record.model_dump_json(exclude_none=True, exclude_defaults=True)
+    max_chars = 1600
+    while token_budget and estimate_tokens(text) > token_budget and max_chars >= 100:
+        data = _shorten(record.model_dump(exclude_none=True, exclude_defaults=True), max_chars)
+        text = type(record).model_validate(data).model_dump_json(exclude_none=True, exclude_defaults=True)
+        max_chars //= 2
+    return text
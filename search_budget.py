@@ -0,0 +1,133 @@
+import contextvars
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from sources import counting_sources
+from tracing import active_trace, traced_call
+
+# ---------- Adaptive Search Budget ---------------------
+"""
+Run-scoped budget for the research agents' search tools. Every search result is scored for novelty (share of sources
+not seen earlier in the run, share of answer text not already returned), and once results stop adding
+anything for a few calls in a row, or the time or cost budget is spent (the clock starts at the first
+search), the search tools tell the agent to stop searching and answer from what it has. The analyst's
+verification searches are not budgeted. The stop reason is recorded in the run trace.
+"""
+
+logger = logging.getLogger(__name__)
+
+SEARCH_BUDGET_ENABLED = os.getenv("SEARCH_BUDGET", "1") != "0"
+MAX_SECONDS = float(os.getenv("SEARCH_BUDGET_SECONDS", 300))
+MAX_COST = float(os.getenv("SEARCH_BUDGET_USD", 0.5))
+MIN_NOVELTY = float(os.getenv("SEARCH_MIN_NOVELTY", 0.25))
+PATIENCE = int(os.getenv("SEARCH_PATIENCE", 2))
+MIN_CALLS = 2
+SHINGLE_WORDS = 3
+
+EXHAUSTED_MESSAGE = ("Search budget exhausted ({reason}). Do not run any more searches: write your final answer "
+                     "from the findings you have already collected.")
+
+_current_budget = contextvars.ContextVar("search_budget", default=None)
+
+
+def shingles(text: str) -> set:
+    words = re.findall(r"\w+", text.lower())
+    return {" ".join(words[start:start + SHINGLE_WORDS]) for start in range(max(len(words) - SHINGLE_WORDS + 1, 1))}
+
+
+class SearchBudget:
+    def __init__(self, max_seconds: float = MAX_SECONDS, max_cost: float = MAX_COST, min_novelty: float = MIN_NOVELTY,
+                 patience: int = PATIENCE):
+        self.max_seconds = max_seconds
+        self.max_cost = max_cost
+        self.min_novelty = min_novelty
+        self.patience = patience
+        self.started = None
+        self.calls = []
+        self.stop_reason = None
+        self._seen = set()
+        self._stale = 0
+        self._lock = threading.Lock()
+
+    def exhausted(self) -> Optional[str]:
+        # The stop reason once the budget is spent, None while searching may continue
+        with self._lock:
+            if self.started is None:
+                self.started = time.monotonic()
+            if self.stop_reason is None:
+                if self.max_seconds and time.monotonic() - self.started >= self.max_seconds:
+                    self.stop_reason = f"time budget of {self.max_seconds:.0f}s reached"
+                trace = active_trace()
+                if self.stop_reason is None and self.max_cost and trace is not None \
+                        and trace.summary()["cost_usd"] >= self.max_cost:
+                    self.stop_reason = f"cost budget of ${self.max_cost:.2f} reached"
+                if self.stop_reason is not None:
+                    logger.info("Stopping research searches: %s", self.stop_reason)
+            return self.stop_reason
+
+    def observe(self, tool: str, result: str, new_sources: int, repeated_sources: int) -> float:
+        result_shingles = shingles(str(result))
+        with self._lock:
+            text_novelty = len(result_shingles - self._seen) / max(len(result_shingles), 1)
+            self._seen |= result_shingles
+            novelty = text_novelty
+            if new_sources + repeated_sources:
+                novelty = (text_novelty + new_sources / (new_sources + repeated_sources)) / 2
+            self.calls.append({"tool": tool, "novelty": round(novelty, 3), "new_sources": new_sources,
+                               "repeated_sources": repeated_sources})
+            self._stale = self._stale + 1 if novelty < self.min_novelty else 0
+            if self.stop_reason is None and len(self.calls) >= MIN_CALLS and self._stale >= self.patience:
+                self.stop_reason = (f"coverage saturated: {self._stale} searches in a row added less than "
+                                    f"{self.min_novelty:.0%} new material")
+                logger.info("Stopping research searches: %s", self.stop_reason)
+        return novelty
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "searches": len(self.calls),
+                "seconds": round(time.monotonic() - self.started, 3) if self.started is not None else 0.0,
+                "stop_reason": self.stop_reason,
+                "calls": list(self.calls),
+            }
+
+
+# ---------- Active Budget ---------------------
+def active_budget() -> Optional[SearchBudget]:
+    return _current_budget.get()
+
+
+@contextmanager
+def search_budget(budget: Optional[SearchBudget] = None):
+    # Budget for one run; the outcome is written into the active run trace when the run ends
+    if budget is None and SEARCH_BUDGET_ENABLED:
+        budget = SearchBudget()
+    token = _current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _current_budget.reset(token)
+        trace = active_trace()
+        if budget is not None and trace is not None:
+            trace.record_search_budget(budget.stats())
+
+
+def budgeted_search(name: str, fn, *args, **kwargs) -> str:
+    # traced_call for search tools: refuses to search once the budget is spent, scores results otherwise
+    budget = active_budget()
+    if budget is None:
+        return traced_call(name, fn, *args, **kwargs)
+    reason = budget.exhausted()
+    if reason is not None:
+        return EXHAUSTED_MESSAGE.format(reason=reason)
+
+    # Sources are counted per call, so concurrent searches (fan-out) don't mix into each other's score
+    with counting_sources() as count:
+        result = traced_call(name, fn, *args, **kwargs)
+    budget.observe(name, result, count.new, count.repeated)
+    return result
@@ -0,0 +1,165 @@
+import contextvars
+import re
+import threading
+from contextlib import contextmanager
+from typing import Callable, Optional
+from urllib.parse import parse_qsl, unquote, urlencode, urlsplit, urlunsplit
+
+# ---------- Source Registry ---------------------
+"""
+Run-scoped registry of every source the agents have seen. URLs are canonicalized (tracking
+parameters stripped, DOI / arXiv / PubMed variants collapsed to one key), so each article is
+fetched at most once per run and cited once in the context handed to downstream tasks.
+"""
+
+TRACKING_PARAMS = re.compile(
+    r"^(utm_\w+|fbclid|gclid|dclid|msclkid|mc_cid|mc_eid|ref_src|_hs\w+|igshid|s_cid)$",
+    re.I,
+)
+# Generic names like ref / source / via carry real content on many sites, so they are only stripped here
+HOST_TRACKING_PARAMS = {
+    "twitter.com": {"ref", "s"},
+    "x.com": {"ref", "s"},
+    "medium.com": {"source"},
+    "linkedin.com": {"trk", "trackingid"},
+    "news.ycombinator.com": {"ref"},
+}
+_DOI = re.compile(r"(10\.\d{4,9}/[^\s?#]+)", re.I)
+# Publisher pages that embed the DOI in the path (link.springer.com/article/10.1007/...,
+# onlinelibrary.wiley.com/doi/full/10.1002/...) or in an id / doi query parameter (PLOS)
+_PATH_DOI = re.compile(r"/(10\.\d{4,9}/.+)$")
+_DOI_PAGE_SUFFIX = re.compile(r"(?:/(?:full|abstract|fulltext|epdf|pdf|html|references|figures|summary)"
+                              r"(?:\.html?)?|\.pdf|\.html?)+$", re.I)
+_ARXIV = re.compile(r"arxiv\.org/(?:abs|pdf|html)/([\w.\-/]+?)(?:v\d+)?(?:\.pdf)?/?$", re.I)
+_PUBMED = re.compile(r"(?:pubmed\.ncbi\.nlm\.nih\.gov/|ncbi\.nlm\.nih\.gov/pubmed/)(\d+)", re.I)
+_PMC = re.compile(r"ncbi\.nlm\.nih\.gov/pmc/articles/(PMC\d+)", re.I)
+
+_current_sources = contextvars.ContextVar("research_sources", default=None)
+_current_count = contextvars.ContextVar("source_count", default=None)
+
+
+def canonicalize_url(url: str) -> str:
+    url = url.strip().strip("<>()[]\"'")
+    location = url.split("?")[0]
+    for pattern, prefix in ((_ARXIV, "arxiv:"), (_PUBMED, "pmid:"), (_PMC, "pmc:")):
+        match = pattern.search(location)
+        if match:
+            return prefix + match.group(1).lower()
+    if re.search(r"(?:^|//)(?:dx\.)?doi\.org/", url, re.I) or url.lower().startswith("doi:"):
+        match = _DOI.search(url)
+        if match:
+            return "doi:" + match.group(1).rstrip(".").lower()
+
+    parts = urlsplit(url if "://" in url else f"https://{url}")
+    match = _PATH_DOI.search(unquote(parts.path))
+    if match is None:
+        match = next((_DOI.fullmatch(unquote(value)) for key, value in parse_qsl(parts.query)
+                      if key.lower() in ("doi", "id") and _DOI.fullmatch(unquote(value))), None)
+    if match:
+        return "doi:" + _DOI_PAGE_SUFFIX.sub("", match.group(1)).rstrip("./").lower()
+
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if host.endswith(":80") or host.endswith(":443"):
+        host = host.rsplit(":", 1)[0]
+    host_params = HOST_TRACKING_PARAMS.get(host, set())
+    query = urlencode(sorted((key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                             if not TRACKING_PARAMS.match(key) and key.lower() not in host_params))
+    path = parts.path.rstrip("/") or ""
+    return urlunsplit(("https", host, path, query, ""))
+
+
+class SourceRegistry:
+    def __init__(self):
+        self.sources = {}
+        self._content = {}
+        self._fetch_locks = {}
+        self._lock = threading.Lock()
+        self.duplicates = 0
+        self.fetches_saved = 0
+
+    def register(self, url: str, title: str = "") -> bool:
+        # True the first time a source is seen in this run, False for any later variant of it
+        key = canonicalize_url(url)
+        with self._lock:
+            if key in self.sources:
+                self.duplicates += 1
+                return False
+            self.sources[key] = {"url": url, "title": title}
+            return True
+
+    def fetch(self, url: str, fetcher: Callable[[str], str]) -> str:
+        # Fetch each canonical source once; concurrent callers for the same source wait for the first.
+        key = canonicalize_url(url)
+        with self._lock:
+            if key in self._content:
+                self.fetches_saved += 1
+                return self._content[key]
+            fetch_lock = self._fetch_locks.setdefault(key, threading.Lock())
+        with fetch_lock:
+            with self._lock:
+                if key in self._content:
+                    self.fetches_saved += 1
+                    return self._content[key]
+            content = fetcher(url)
+            with self._lock:
+                self._content[key] = content
+            return content
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"sources": len(self.sources), "duplicates_dropped": self.duplicates,
+                    "fetches_saved": self.fetches_saved}
+
+
+class SourceCount:
+    # New vs. already-seen sources registered within one tool call (including its worker threads)
+    def __init__(self):
+        self.new = 0
+        self.repeated = 0
+        self._lock = threading.Lock()
+
+    def add(self, is_new: bool):
+        with self._lock:
+            if is_new:
+                self.new += 1
+            else:
+                self.repeated += 1
+
+
+# ---------- Active Registry ---------------------
+def active_sources() -> Optional[SourceRegistry]:
+    return _current_sources.get()
+
+
+@contextmanager
+def tracking_sources(registry: Optional[SourceRegistry] = None):
+    token = _current_sources.set(registry if registry is not None else SourceRegistry())
+    try:
+        yield _current_sources.get()
+    finally:
+        _current_sources.reset(token)
+
+
+@contextmanager
+def counting_sources():
+    token = _current_count.set(SourceCount())
+    try:
+        yield _current_count.get()
+    finally:
+        _current_count.reset(token)
+
+
+def is_new_source(url: str, title: str = "") -> bool:
+    registry = active_sources()
+    is_new = True if registry is None else registry.register(url, title)
+    count = _current_count.get()
+    if count is not None:
+        count.add(is_new)
+    return is_new
+
+
+def fetch_once(url: str, fetcher: Callable[[str], str]) -> str:
+    registry = active_sources()
+    return fetcher(url) if registry is None else registry.fetch(url, fetcher)
@@ -0,0 +1,154 @@
+import logging
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+from cache import bypass_cache
+from checkpoints import Checkpointer, checkpointing
+from report_store import ReportStore
+from search_budget import search_budget
+from sources import tracking_sources
+from tracing import RunTrace, tracing
+
+# ---------- Run Streaming ---------------------
+"""
+Runs a crew kickoff on a background thread and turns agent steps, tool calls, task completions and
+LLM tokens into events on a queue. The job worker that started the run drains the queue into the job
+database, so the polling page updates while the crew is still working and a run can be cancelled
+between steps.
+"""
+
+logger = logging.getLogger(__name__)
+
+try:
+    from crewai.events import crewai_event_bus
+    from crewai.events.types.llm_events import LLMStreamChunkEvent
+except ImportError:
+    try:  # crewai releases before the event bus moved out of crewai.utilities
+        from crewai.utilities.events import crewai_event_bus
+        from crewai.utilities.events.llm_events import LLMStreamChunkEvent
+    except ImportError:
+        crewai_event_bus = None
+        logger.warning("crewai has no LLM event bus: agent steps still stream, LLM tokens do not")
+
+_active = threading.local()
+
+
+class RunCancelled(Exception):
+    pass
+
+
+def current_stream() -> Optional["RunStream"]:
+    return getattr(_active, "stream", None)
+
+
+@contextmanager
+def using_stream(stream: Optional["RunStream"]):
+    # Makes another thread (e.g. a fan-out worker) report into the stream of the run it works for
+    previous = current_stream()
+    _active.stream = stream
+    try:
+        yield stream
+    finally:
+        _active.stream = previous
+
+
+def describe_step(step) -> str:
+    # step is an AgentAction (tool call), AgentFinish or ToolResult depending on the crewai version
+    tool = getattr(step, "tool", None)
+    if tool:
+        return f"**Tool call:** {tool} `{str(getattr(step, 'tool_input', ''))[:300]}`"
+    thought = getattr(step, "thought", "") or ""
+    result = getattr(step, "output", None) or getattr(step, "result", None) or ""
+    text = thought if thought else str(result)
+    return f"**Step:** {text[:500]}"
+
+
+# ---------- Crew Callbacks ---------------------
+# Tasks and agents are built per job, but crewai calls these callbacks without any handle on the run,
+# so they look up the stream of the thread running it.
+def step_callback(step):
+    stream = current_stream()
+    if stream is None:
+        return
+    if stream.cancelled.is_set():
+        raise RunCancelled("Run cancelled by user")
+    stream.events.put(("step", describe_step(step)))
+
+
+def task_callback(output):
+    stream = current_stream()
+    if stream is not None:
+        stream.events.put(("task", output))
+
+
+if crewai_event_bus is not None:
+    @crewai_event_bus.on(LLMStreamChunkEvent)
+    def _on_stream_chunk(source, event):
+        stream = current_stream()
+        if stream is not None:
+            stream.events.put(("token", event.chunk))
+
+
+class RunStream:
+    def __init__(self):
+        self.events = queue.Queue()
+        self.cancelled = threading.Event()
+        self.thread = None
+        self.trace = None
+        self.use_cache = True
+        self.checkpointer = None
+        self.store = None
+
+    def start(self, crew, inputs: dict, trace: Optional[RunTrace] = None, use_cache: bool = True,
+              checkpointer: Optional[Checkpointer] = None, store: Optional[ReportStore] = None):
+        self.trace = trace
+        self.store = store
+        self.use_cache = use_cache
+        self.checkpointer = checkpointer
+        self.thread = threading.Thread(target=self._run, args=(crew, inputs), daemon=True)
+        self.thread.start()
+        return self
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def _run(self, crew, inputs: dict):
+        _active.stream = self
+        try:
+            with tracing(self.trace), bypass_cache(not self.use_cache), checkpointing(self.checkpointer), \
+                    tracking_sources(), search_budget():
+                result = crew.kickoff(inputs=inputs)
+            if self.store is not None and self.trace is not None:
+                self.store.save(self.trace.run_id, inputs.get("topic", ""), self.trace.model, result.raw)
+            self._write_trace()
+            self.events.put(("done", result))
+        except RunCancelled:
+            self._write_trace()
+            self.events.put(("cancelled", None))
+        except Exception as error:
+            print(f"An error occurred: {error}")
+            self._write_trace()
+            self.events.put(("error", error))
+        finally:
+            _active.stream = None
+
+    def _write_trace(self):
+        # Written from the run thread so the trace survives a Streamlit rerun of the page.
+        if self.trace is not None:
+            self.trace.finish()
+            self.trace.write()
+
+    def iter_events(self, poll_interval: float = 0.1):
+        # Yields events until the run finishes, is cancelled or fails.
+        while True:
+            try:
+                kind, payload = self.events.get(timeout=poll_interval)
+            except queue.Empty:
+                if self.thread is not None and not self.thread.is_alive() and self.events.empty():
+                    return
+                continue
+            yield kind, payload
+            if kind in ("done", "cancelled", "error"):
+                return
@@ -0,0 +1,135 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Optional
+
+# ---------- Run Tracing ---------------------
+"""
+Per-run performance trace: wall time per task, every tool invocation (latency, payload size) and
+every LLM call (latency, prompt/completion tokens, estimated cost). The active trace is held in a
+context variable, so tools and LLM wrappers record into whichever run they are executing for.
+"""
+
+TRACE_DIR = os.getenv("RESEARCH_TRACE_DIR", "traces")
+
+_current_trace = contextvars.ContextVar("research_trace", default=None)
+
+
+class RunTrace:
+    def __init__(self, topic: str = "", model: str = "", run_id: str = None):
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.topic = topic
+        self.model = model
+        self.started = time.time()
+        self.finished = None
+        self.tasks = []
+        self.tools = []
+        self.llm_calls = []
+        self.search_budget = None
+        self._last_mark = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def record_task(self, name: str, agent: str = ""):
+        # Tasks run sequentially, so a task's wall time is the time since the previous one finished.
+        now = time.perf_counter()
+        with self._lock:
+            self.tasks.append({"task": name, "agent": agent, "seconds": round(now - self._last_mark, 3)})
+            self._last_mark = now
+
+    def record_tool(self, name: str, seconds: float, payload_bytes: int, error: str = None):
+        with self._lock:
+            self.tools.append({
+                "tool": name,
+                "seconds": round(seconds, 3),
+                "payload_bytes": payload_bytes,
+                "error": error,
+            })
+
+    def record_llm(self, model: str, seconds: float, prompt_tokens: int, completion_tokens: int, cost: float,
+                   cached: bool = False):
+        with self._lock:
+            self.llm_calls.append({
+                "model": model,
+                "seconds": round(seconds, 3),
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "cost_usd": round(cost, 6),
+                "cached": cached,
+            })
+
+    def record_search_budget(self, stats: dict):
+        with self._lock:
+            self.search_budget = stats
+
+    def finish(self):
+        self.finished = time.time()
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                "run_id": self.run_id,
+                "wall_seconds": round((self.finished or time.time()) - self.started, 3),
+                "task_seconds": {task["task"]: task["seconds"] for task in self.tasks},
+                "tool_calls": len(self.tools),
+                "tool_seconds": round(sum(tool["seconds"] for tool in self.tools), 3),
+                "llm_calls": len(self.llm_calls),
+                "llm_cache_hits": sum(1 for call in self.llm_calls if call.get("cached")),
+                "llm_seconds": round(sum(call["seconds"] for call in self.llm_calls), 3),
+                "prompt_tokens": sum(call["prompt_tokens"] for call in self.llm_calls),
+                "completion_tokens": sum(call["completion_tokens"] for call in self.llm_calls),
+                "cost_usd": round(sum(call["cost_usd"] for call in self.llm_calls), 6),
+                "search_stop_reason": (self.search_budget or {}).get("stop_reason"),
+            }
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            detail = {"tasks": list(self.tasks), "tools": list(self.tools), "llm_calls": list(self.llm_calls),
+                      "search_budget": self.search_budget}
+        return {"topic": self.topic, "model": self.model, "started": self.started,
+                "summary": self.summary(), **detail}
+
+    def write(self, directory: str = TRACE_DIR) -> str:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.run_id}.json")
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump(self.to_dict(), handle, indent=2)
+        return path
+
+
+# ---------- Recording Helpers ---------------------
+# All of these are no-ops when no trace is active, so untraced runs pay nothing.
+def active_trace() -> Optional[RunTrace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def tracing(trace: Optional[RunTrace]):
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def traced_call(name: str, fn, *args, **kwargs):
+    trace = active_trace()
+    if trace is None:
+        return fn(*args, **kwargs)
+    started = time.perf_counter()
+    try:
+        result = fn(*args, **kwargs)
+    except Exception as error:
+        trace.record_tool(name, time.perf_counter() - started, 0, error=str(error))
+        raise
+    trace.record_tool(name, time.perf_counter() - started, len(str(result).encode("utf-8")))
+    return result
+
+
+def record_task(output):
+    trace = active_trace()
+    if trace is not None:
+        trace.record_task(getattr(output, "name", None) or str(output.agent), agent=str(output.agent))
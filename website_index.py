@@ -0,0 +1,158 @@
+import hashlib
+import html
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from http_client import limited_request
+
+# ---------- Website Embedding Index ---------------------
+"""
+Persistent vector index behind the website search tool. Pages are keyed by URL, the hash of their
+extracted text and the embedding model, so an unchanged page is never chunked or embedded twice and
+a model change re-embeds it instead of mixing vectors of different sizes. Vectors live in a
+SQLite file opened with memory-mapped I/O, which lets every worker process share one index, and the
+least recently used pages are evicted once the stored vectors exceed EMBED_INDEX_MAX_MB.
+"""
+
+INDEX_PATH = os.getenv("EMBED_INDEX_PATH", os.path.join(os.getenv("RESEARCH_CACHE_DIR", ".research_cache"),
+                                                         "website_index.sqlite3"))
+MAX_INDEX_BYTES = int(float(os.getenv("EMBED_INDEX_MAX_MB", 512)) * 2 ** 20)
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+CHUNK_CHARS = 1200
+CHUNK_OVERLAP = 200
+EMBED_BATCH = 64
+
+
+def html_to_text(page: str) -> str:
+    page = re.sub(r"(?is)<(script|style|noscript|svg|head).*?</\1>", " ", page)
+    page = re.sub(r"(?s)<[^>]+>", " ", page)
+    return re.sub(r"\s+", " ", html.unescape(page)).strip()
+
+
+def chunk_text(text: str) -> list:
+    step = CHUNK_CHARS - CHUNK_OVERLAP
+    return [text[start:start + CHUNK_CHARS] for start in range(0, max(len(text), 1), step) if text[start:start + 1]]
+
+
+def embed(texts: list) -> np.ndarray:
+    base_url = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/")
+    vectors = []
+    for start in range(0, len(texts), EMBED_BATCH):
+        response = limited_request(
+            "embeddings", "POST", f"{base_url}/embeddings",
+            json={"model": EMBEDDING_MODEL, "input": texts[start:start + EMBED_BATCH]},
+            headers={"Authorization": f"Bearer {os.getenv('OPENAI_API_KEY', '')}"},
+        )
+        data = sorted(response.json()["data"], key=lambda item: item["index"])
+        vectors.extend(item["embedding"] for item in data)
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+class WebsiteIndex:
+    def __init__(self, path: str = INDEX_PATH, max_bytes: int = MAX_INDEX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA mmap_size={max_bytes * 2}")
+        self._conn.executescript(
+            """CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                model TEXT NOT NULL DEFAULT '',
+                vector_bytes INTEGER NOT NULL,
+                accessed REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS chunks (
+                url TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                text TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                PRIMARY KEY (url, position)
+            );"""
+        )
+        # Indexes created before the model was recorded get the column; their pages are re-embedded on use
+        if "model" not in {row[1] for row in self._conn.execute("PRAGMA table_info(pages)")}:
+            self._conn.execute("ALTER TABLE pages ADD COLUMN model TEXT NOT NULL DEFAULT ''")
+        self._conn.commit()
+
+    def _stored_key(self, url: str):
+        row = self._conn.execute("SELECT content_hash, model FROM pages WHERE url = ?", (url,)).fetchone()
+        return tuple(row) if row else None
+
+    def index_page(self, url: str, text: str) -> bool:
+        # Returns True when the page had to be (re-)embedded, False when the stored vectors were reused.
+        content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            if self._stored_key(url) == (content_hash, EMBEDDING_MODEL):
+                self._conn.execute("UPDATE pages SET accessed = ? WHERE url = ?", (time.time(), url))
+                self._conn.commit()
+                return False
+
+        chunks = chunk_text(text)
+        vectors = embed(chunks) if chunks else np.zeros((0, 1), dtype=np.float32)
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks WHERE url = ?", (url,))
+            self._conn.executemany(
+                "INSERT INTO chunks (url, position, text, vector) VALUES (?, ?, ?, ?)",
+                [(url, position, chunk, vector.tobytes()) for position, (chunk, vector) in enumerate(zip(chunks, vectors))],
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (url, content_hash, model, vector_bytes, accessed) VALUES (?, ?, ?, ?, ?)",
+                (url, content_hash, EMBEDDING_MODEL, int(vectors.nbytes), time.time()),
+            )
+            self._evict()
+            self._conn.commit()
+        return True
+
+    def _evict(self):
+        (total,) = self._conn.execute("SELECT COALESCE(SUM(vector_bytes), 0) FROM pages").fetchone()
+        if total <= self.max_bytes:
+            return
+        for url, size in self._conn.execute("SELECT url, vector_bytes FROM pages ORDER BY accessed ASC").fetchall():
+            self._conn.execute("DELETE FROM chunks WHERE url = ?", (url,))
+            self._conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def search(self, url: str, query: str, top_k: int = 4) -> list:
+        with self._lock:
+            # Only vectors from the current model are comparable with the query embedding
+            rows = self._conn.execute(
+                "SELECT chunks.text, chunks.vector FROM chunks JOIN pages ON pages.url = chunks.url "
+                "WHERE chunks.url = ? AND pages.model = ?",
+                (url, EMBEDDING_MODEL),
+            ).fetchall()
+        if not rows:
+            return []
+        matrix = np.vstack([np.frombuffer(vector, dtype=np.float32) for _, vector in rows])
+        scores = matrix @ embed([query])[0]
+        best = np.argsort(scores)[::-1][:top_k]
+        return [rows[index][0] for index in best]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> WebsiteIndex:
+    # One index per process; the Streamlit reruns and every crew share it.
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = WebsiteIndex()
+        return _index
+
+
+def fetch_text(url: str) -> str:
+    response = limited_request("website", "GET", url, headers={"user-agent": "Mozilla/5.0 (research agent)"})
+    return html_to_text(response.text)